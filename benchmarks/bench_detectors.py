@@ -0,0 +1,166 @@
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from pnd_moex.general.bursts import CommentBursts
+from pnd_moex.general.event_study import extract_event_windows, price_panel
+from pnd_moex.general.general import anomaly_detect, anomaly_news_markup_func
+from pnd_moex.general.sweep import threshold_sweep
+from pnd_moex.util.other import find_all_sequences
+
+from .synthetic import generate_comments, generate_ohlcv, security_series
+
+
+def _peak_alloc(func, *args, **kwargs) -> int:
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class AnomalyDetect:
+    params = ([10, 100, 500], [False, True])
+    param_names = ["n_securities", "adtk_all"]
+    timeout = 600
+
+    def setup(self, n_securities, adtk_all):
+        df, _ = generate_ohlcv(n_securities=n_securities)
+        self.series = list(security_series(df).values())
+        self.bars = len(df)
+        self.flags = dict(quantile=True, persist=adtk_all, volatility=adtk_all)
+
+    def _run(self):
+        for ts in self.series:
+            anomaly_detect(ts, **self.flags)
+
+    def time_anomaly_detect(self, n_securities, adtk_all):
+        self._run()
+
+    def peakmem_anomaly_detect(self, n_securities, adtk_all):
+        self._run()
+
+    def track_bars_per_second(self, n_securities, adtk_all):
+        start = time.perf_counter()
+        self._run()
+        return self.bars / (time.perf_counter() - start)
+
+    track_bars_per_second.unit = "bars/s"
+
+
+class AnomalyNewsMarkup:
+    params = [10, 100, 500]
+    param_names = ["n_securities"]
+    timeout = 600
+
+    def setup(self, n_securities):
+        df, events = generate_ohlcv(n_securities=n_securities)
+        news = dict(zip(events["token"], events["p_date"]))
+        self.inputs = []
+        for secid, sec_df in df.groupby("SECID", sort=False):
+            sec_df = sec_df.set_index("TRADEDATE")
+            anomalies = anomaly_detect(sec_df["CLOSE"], quantile=False)
+            self.inputs.append((sec_df, anomalies["3over20"], news.get(secid, [])))
+        self.bars = len(df)
+
+    def _run(self):
+        for sec_df, anomaly_map, news_list in self.inputs:
+            anomaly_news_markup_func(sec_df, anomaly_map, news_list)
+
+    def time_anomaly_news_markup(self, n_securities):
+        self._run()
+
+    def track_peak_alloc(self, n_securities):
+        return _peak_alloc(self._run)
+
+    track_peak_alloc.unit = "bytes"
+
+    def track_bars_per_second(self, n_securities):
+        start = time.perf_counter()
+        self._run()
+        return self.bars / (time.perf_counter() - start)
+
+    track_bars_per_second.unit = "bars/s"
+
+
+_MAX_SESSIONS = 10_000
+
+
+class FindAllSequences:
+    params = [1_000, 100_000]
+    param_names = ["length"]
+
+    def setup(self, length):
+        # Business days run out of ns timestamps around 60k sessions after 2019,
+        # so longer sequences repeat a shorter history
+        n_sessions = min(length, _MAX_SESSIONS)
+        df, _ = generate_ohlcv(
+            n_securities=1, n_sessions=n_sessions, pumps_per_security=n_sessions / 200
+        )
+        flags = anomaly_detect(df.set_index("TRADEDATE")["CLOSE"], quantile=False)[
+            "3over20"
+        ].to_numpy()
+        marks = (df["CLOSE"].pct_change() > 0).astype(int).to_numpy()
+        self.flags = np.resize(flags, length).tolist()
+        self.marks = np.resize(marks, length).tolist()
+
+    def time_with_key(self, length):
+        find_all_sequences(self.flags, lambda x: x)
+
+    def time_all_values(self, length):
+        find_all_sequences(self.marks)
+
+
+class ThresholdSweep:
+    params = [100, 300]
+    param_names = ["n_securities"]
+    timeout = 600
+
+    def setup(self, n_securities):
+        df, self.events = generate_ohlcv(n_securities=n_securities, n_sessions=2_500)
+        self.close = df.pivot(index="TRADEDATE", columns="SECID", values="CLOSE")
+
+    def time_default_grid(self, n_securities):
+        threshold_sweep(self.close, self.events, n_jobs=1)
+
+    def peakmem_default_grid(self, n_securities):
+        threshold_sweep(self.close, self.events, n_jobs=1)
+
+
+class EventWindows:
+    params = [1_000, 10_000]
+    param_names = ["n_events"]
+
+    def setup(self, n_events):
+        df, self.events = generate_ohlcv(
+            n_securities=300, n_sessions=2_500, pumps_per_security=n_events / 300
+        )
+        self.panel, self.dates, self.secids = price_panel(df)
+
+    def time_extract_event_windows(self, n_events):
+        extract_event_windows(
+            self.events, self.panel, self.dates, self.secids, before=20, after=10
+        )
+
+
+class CommentBurstDetection:
+    params = [100_000, 1_000_000]
+    param_names = ["n_comments"]
+    timeout = 300
+
+    def setup(self, n_comments):
+        self.comments = generate_comments(n_comments=n_comments, n_days=1_000)
+        self.sessions = pd.bdate_range("2019-01-01", "2021-09-30")
+        self.bursts = CommentBursts(self.sessions)
+        self.bursts.add_comments(self.comments.iloc[:-1_000])
+        self.tail = self.comments.iloc[-1_000:]
+
+    def time_add_history(self, n_comments):
+        CommentBursts(self.sessions).add_comments(self.comments)
+
+    def time_add_page_batch(self, n_comments):
+        # Repeated batches inflate the counts, which does not change the work done
+        self.bursts.add_comments(self.tail)
@@ -0,0 +1,86 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+from pnd_moex.util.fetch import FetchScheduler
+
+N_PAGES = 400
+PAGE = b"x" * 20_000
+
+
+class SimulatedForum:
+    """
+    MockTransport handler of a server that serves `capacity` requests at once at base latency,
+    slows down linearly above it and throttles with 429 above twice the capacity.
+    """
+
+    def __init__(self, capacity: int = 12, latency: float = 0.01, seed: int = 1):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.random = random.Random(seed)
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            if self.in_flight > 2 * self.capacity:
+                return httpx.Response(429, headers={"Retry-After": "0"})
+            # Slow pages are what makes fixed chunks wait
+            slow = 5 if self.random.random() < 0.02 else 1
+            load = max(1.0, self.in_flight / self.capacity)
+            await asyncio.sleep(self.latency * slow * load)
+            return httpx.Response(200, content=PAGE)
+        finally:
+            self.in_flight -= 1
+
+
+def _urls() -> list:
+    return [f"https://smart-lab.ru/forum/TEST/page{i}/" for i in range(1, N_PAGES + 1)]
+
+
+async def _fetch_chunked(urls: list, chunk_size: int, max_connections: int) -> list:
+    # The fixed-chunk crawl the scheduler replaces
+    semaphore = asyncio.Semaphore(max_connections)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(SimulatedForum())) as c:
+
+        async def get(url):
+            async with semaphore:
+                return await c.get(url)
+
+        responses = []
+        for i in range(0, len(urls), chunk_size):
+            responses += await asyncio.gather(
+                *[get(u) for u in urls[i : i + chunk_size]]
+            )
+    return responses
+
+
+async def _fetch_scheduled(urls: list, scheduler: FetchScheduler) -> list:
+    async with httpx.AsyncClient(transport=httpx.MockTransport(SimulatedForum())) as c:
+        return await scheduler.fetch_all(urls, c)
+
+
+class ForumFetch:
+    timeout = 300
+
+    def setup(self):
+        self.urls = _urls()
+
+    def track_chunked_pages_per_second(self):
+        start = time.perf_counter()
+        responses = asyncio.run(_fetch_chunked(self.urls, 200, 8))
+        return sum(r.is_success for r in responses) / (time.perf_counter() - start)
+
+    track_chunked_pages_per_second.unit = "pages/s"
+
+    def track_scheduled_pages_per_second(self):
+        scheduler = FetchScheduler(max_concurrency=32, backoff_base=0.05)
+        start = time.perf_counter()
+        responses = asyncio.run(_fetch_scheduled(self.urls, scheduler))
+        return sum(r is not None and r.is_success for r in responses) / (
+            time.perf_counter() - start
+        )
+
+    track_scheduled_pages_per_second.unit = "pages/s"
@@ -0,0 +1,13 @@
+from .importtime import BUDGETS, own_import_ms
+
+
+class ImportTime:
+    params = list(BUDGETS)
+    param_names = ["module"]
+    timeout = 120
+
+    def track_import_ms(self, module):
+        # On top of numpy and pandas, the same measure as the budget check
+        return own_import_ms(module)[0]
+
+    track_import_ms.unit = "ms"
@@ -0,0 +1,178 @@
+import time
+
+import bs4
+import numpy as np
+import pandas as pd
+
+from pnd_moex.general.moex_selenium_parser import parse_news_page
+from pnd_moex.general.near_duplicates import NearDuplicateIndex, minhash_signatures
+from pnd_moex.general.search_index import SearchIndex
+from pnd_moex.general.scraper import (
+    MFD_DATETIME_FORMAT,
+    MOSCOW_TZ,
+    extract_comments_from_page,
+    extract_mfd_comment_data,
+    extract_smartlab_comment_data,
+    normalize_comment_datetimes,
+)
+
+from .synthetic import FakeResponse, generate_comments, read_fixture
+
+SMARTLAB_COMMENTS_PER_COPY = 4
+MFD_COMMENTS_PER_COPY = 3
+
+
+class SmartlabComments:
+    # A real forum page holds ~50 comments
+    params = [1, 12, 250]
+    param_names = ["copies"]
+
+    def setup(self, copies):
+        self.page = FakeResponse(read_fixture("smartlab_forum_page.html", copies))
+        self.comments = copies * SMARTLAB_COMMENTS_PER_COPY
+
+    def time_extract_comments_from_page(self, copies):
+        extract_comments_from_page(self.page)
+
+    def peakmem_extract_comments_from_page(self, copies):
+        extract_comments_from_page(self.page)
+
+    def track_comments_per_second(self, copies):
+        start = time.perf_counter()
+        extract_comments_from_page(self.page)
+        return self.comments / (time.perf_counter() - start)
+
+    track_comments_per_second.unit = "comments/s"
+
+
+class SmartlabCommentExtractor:
+    def setup(self):
+        soup = bs4.BeautifulSoup(
+            read_fixture("smartlab_forum_page.html", 250), "html.parser"
+        )
+        self.comments = soup.find_all("li", attrs={"data-type": "comment"})
+
+    def time_extract_smartlab_comment_data(self):
+        for comment in self.comments:
+            extract_smartlab_comment_data(comment)
+
+
+class MfdComments:
+    params = [1, 16, 330]
+    param_names = ["copies"]
+
+    def setup(self, copies):
+        self.page = FakeResponse(
+            read_fixture("mfd_forum_page.html", copies),
+            url="https://forum.mfd.ru/forum/thread/?id=1",
+        )
+        self.comments = copies * MFD_COMMENTS_PER_COPY
+        self.comment_dict = dict(name="div", class_="mfd-post")
+
+    def time_extract_comments_from_page(self, copies):
+        extract_comments_from_page(
+            self.page, self.comment_dict, extract_mfd_comment_data
+        )
+
+    def track_comments_per_second(self, copies):
+        start = time.perf_counter()
+        extract_comments_from_page(
+            self.page, self.comment_dict, extract_mfd_comment_data
+        )
+        return self.comments / (time.perf_counter() - start)
+
+    track_comments_per_second.unit = "comments/s"
+
+
+class MoexNews:
+    def setup(self):
+        self.html = read_fixture("moex_news_page.html")
+
+    def time_parse_news_page(self):
+        parse_news_page(self.html, "https://www.moex.com/n00000")
+
+
+class CommentDatetimes:
+    params = [10_000, 1_000_000]
+    param_names = ["n_comments"]
+    timeout = 300
+
+    def setup(self, n_comments):
+        rng = np.random.default_rng(42)
+        seconds = rng.integers(0, 5 * 365 * 86400, size=n_comments)
+        times = pd.Timestamp("2019-01-01", tz=MOSCOW_TZ) + pd.to_timedelta(
+            np.sort(seconds), unit="s"
+        )
+        self.smartlab = pd.Series(times.strftime("%Y-%m-%dT%H:%M:%S%z"))
+        self.mfd = pd.Series(times.strftime(MFD_DATETIME_FORMAT))
+
+    def time_smartlab(self, n_comments):
+        normalize_comment_datetimes(pd.DataFrame({"comment_datetime": self.smartlab}))
+
+    def time_mfd(self, n_comments):
+        normalize_comment_datetimes(
+            pd.DataFrame({"comment_datetime": self.mfd}),
+            datetime_format=MFD_DATETIME_FORMAT,
+            source_tz=MOSCOW_TZ,
+        )
+
+    def track_smartlab_comments_per_second(self, n_comments):
+        start = time.perf_counter()
+        self.time_smartlab(n_comments)
+        return n_comments / (time.perf_counter() - start)
+
+    track_smartlab_comments_per_second.unit = "comments/s"
+
+    def track_mfd_comments_per_second(self, n_comments):
+        start = time.perf_counter()
+        self.time_mfd(n_comments)
+        return n_comments / (time.perf_counter() - start)
+
+    track_mfd_comments_per_second.unit = "comments/s"
+
+
+class NearDuplicates:
+    params = [10_000, 100_000]
+    param_names = ["n_comments"]
+    timeout = 600
+
+    def setup(self, n_comments):
+        self.comments = generate_comments(n_comments=n_comments, n_days=100)
+        self.texts = self.comments["comment_text"].tolist()
+        self.index = NearDuplicateIndex()
+        self.index.add(self.comments, n_jobs=1)
+
+    def time_minhash_signatures(self, n_comments):
+        # Single process, so results do not depend on the machine's core count
+        minhash_signatures(self.texts, n_jobs=1)
+
+    def time_clusters(self, n_comments):
+        self.index.clusters(min_users=2)
+
+    def time_query(self, n_comments):
+        self.index.query(self.texts[0])
+
+
+class TickerSearch:
+    params = [10_000, 100_000]
+    param_names = ["n_comments"]
+    timeout = 600
+
+    def setup(self, n_comments):
+        self.comments = generate_comments(n_comments=n_comments, n_days=1_000)
+        self.comments.loc[::100, "comment_text"] += " ПАО Тестовая компания, TEST"
+        self.index = SearchIndex()
+        self.index.add_comments(self.comments, n_jobs=1)
+
+    def time_build(self, n_comments):
+        SearchIndex().add_comments(self.comments, n_jobs=1)
+
+    def time_find_security(self, n_comments):
+        self.index.find_security("TEST", "RU000A0TEST1", ("Тестовая компания",))
+
+    def time_find_security_range(self, n_comments):
+        self.index.find_security("TEST", start="2020-01-01", end="2020-03-31")
+
+    def time_str_contains_scan(self, n_comments):
+        # The scan the index replaces
+        self.comments["comment_text"].str.contains("TEST|Тестовая компания", case=False)
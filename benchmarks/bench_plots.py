@@ -0,0 +1,21 @@
+from pnd_moex.general.general import anomaly_detect
+from pnd_moex.general.plots import gather_all_visuals
+
+from .synthetic import generate_ohlcv
+
+
+class GatherAllVisuals:
+    params = [750, 5_000]
+    param_names = ["n_sessions"]
+
+    def setup(self, n_sessions):
+        df, _ = generate_ohlcv(
+            n_securities=1, n_sessions=n_sessions, pumps_per_security=n_sessions / 100
+        )
+        self.anomalies = anomaly_detect(df.set_index("TRADEDATE")["CLOSE"])
+
+    def time_gather_all_visuals(self, n_sessions):
+        gather_all_visuals(self.anomalies)
+
+    def peakmem_gather_all_visuals(self, n_sessions):
+        gather_all_visuals(self.anomalies)
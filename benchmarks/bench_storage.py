@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+
+import numpy as np
+from pandas.tseries.offsets import BDay
+
+from pnd_moex.general.price_matrix import PriceMatrix
+from pnd_moex.general.samples import WindowSampler
+
+from .synthetic import generate_ohlcv
+
+
+class _PriceMatrixSetup:
+    # Roughly the TQBR board over 10 and 25 years
+    params = [(300, 2_500), (300, 6_250)]
+    param_names = ["shape"]
+    timeout = 300
+
+    def setup(self, shape):
+        n_securities, n_sessions = shape
+        self.path = tempfile.mkdtemp()
+        df, _ = generate_ohlcv(n_securities=n_securities, n_sessions=n_sessions)
+        PriceMatrix.build(df, self.path)
+        self.new_day = df[df["TRADEDATE"] == df["TRADEDATE"].max()].copy()
+        self.new_day["TRADEDATE"] += BDay(1)
+
+    def teardown(self, shape):
+        shutil.rmtree(self.path)
+
+
+class PriceMatrixOpen(_PriceMatrixSetup):
+    def time_open(self, shape):
+        PriceMatrix.open(self.path).field("CLOSE")
+
+    def time_security_frame(self, shape):
+        PriceMatrix.open(self.path).security_frame("S0000")
+
+
+class PriceMatrixAppend(_PriceMatrixSetup):
+    # Appending mutates the matrix, so every sample gets a fresh setup
+    number = 1
+    warmup_time = 0
+
+    def time_append_session(self, shape):
+        PriceMatrix.open(self.path).append_sessions(self.new_day)
+
+
+class WindowSamples:
+    params = [5, 60]
+    param_names = ["window"]
+
+    def setup(self, window):
+        df, _ = generate_ohlcv(n_securities=100, n_sessions=2_500)
+        rng = np.random.default_rng(0)
+        self.frames = {}
+        for secid, group in df.groupby("SECID"):
+            frame = group.set_index("TRADEDATE").drop(columns=["SECID", "currencyid"])
+            frame["mark"] = rng.choice(
+                [-1, 0, 1], p=[0.01, 0.94, 0.05], size=len(frame)
+            )
+            self.frames[secid] = frame
+        self.sampler = WindowSampler(self.frames, window=window)
+
+    def time_build(self, window):
+        WindowSampler(self.frames, window=window)
+
+    def time_shuffled_epoch(self, window):
+        for _ in self.sampler.batches(256, seed=0):
+            pass
+
+    def peakmem_shuffled_epoch(self, window):
+        for _ in self.sampler.batches(256, seed=0):
+            pass
@@ -0,0 +1,91 @@
+"""
+Import-time budget check based on ``python -X importtime``.
+
+Run as ``python -m benchmarks.importtime`` from the repository root, exits with 1 if a budget is exceeded
+or a heavy optional backend is imported eagerly.
+"""
+import re
+import subprocess
+import sys
+
+# Backends which must stay lazy for the light modules
+HEAVY_MODULES = [
+    "adtk",
+    "arrow",
+    "bs4",
+    "fuzzywuzzy",
+    "httpx",
+    "isswrapper",
+    "plotly",
+    "requests",
+    "selenium",
+]
+
+# Budgets in milliseconds for the module itself, on top of numpy and pandas
+BUDGETS = {
+    "pnd_moex.general.general": 50,
+    "pnd_moex.general.scraper": 50,
+    "pnd_moex.general.plots": 50,
+    "pnd_moex.general.moex_selenium_parser": 50,
+    "pnd_moex.util.other": 5,
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(module: str, preload: tuple = ()) -> dict:
+    """
+    Import a module in a fresh interpreter and collect cumulative import times.
+
+    :param module: Module name to import.
+    :type module: str
+    :param preload: Modules imported before it, their time is not part of the module's, defaults to ().
+    :type preload: tuple, optional
+    :return: Dictionary module name -> cumulative import time in microseconds.
+    :rtype: dict
+    """
+    code = "".join(f"import {name}; " for name in preload) + f"import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            profile[match.group(4)] = int(match.group(2))
+    return profile
+
+
+def own_import_ms(module: str) -> tuple[float, list[str]]:
+    """
+    Measure the import time of a module excluding numpy and pandas, and list heavy backends it loaded.
+
+    :param module: Module name to import.
+    :type module: str
+    :return: Import time in milliseconds and eagerly imported heavy modules.
+    :rtype: tuple[float, list[str]]
+    """
+    # Preloaded modules are not imported again, so the module's cumulative time excludes them
+    profile = import_profile(module, preload=("numpy", "pandas"))
+    heavy = [name for name in HEAVY_MODULES if name in profile]
+    return profile[module] / 1000, heavy
+
+
+def main() -> int:
+    failed = False
+    for module, budget in BUDGETS.items():
+        ms, heavy = own_import_ms(module)
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        status = "ok" if ok else "FAIL"
+        print(
+            f"{status:4} {module:45} {ms:8.1f} ms (budget {budget} ms) {' '.join(heavy)}"
+        )
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def generate_ohlcv(
+    n_securities: int = 100,
+    n_sessions: int = 750,
+    pumps_per_security: float = 0.5,
+    start: str = "2019-01-01",
+    seed: int = 42,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generate daily candles for a synthetic board with injected pump-and-dump patterns.
+
+    Prices follow a geometric random walk. Every pump is three sessions of 25-35% growth on
+    a volume spike, followed by a five session dump, so both the "3over20" and "80over3"
+    rules fire on it.
+
+    :param n_securities: Number of securities in the universe, defaults to 100.
+    :type n_securities: int, optional
+    :param n_sessions: Number of business days, defaults to 750.
+    :type n_sessions: int, optional
+    :param pumps_per_security: Average number of injected pumps per security, defaults to 0.5.
+    :type pumps_per_security: float, optional
+    :param start: First trading date, defaults to "2019-01-01".
+    :type start: str, optional
+    :param seed: Random seed, defaults to 42.
+    :type seed: int, optional
+    :return: Candles in the MOEX history layout (TRADEDATE/OPEN/HIGH/LOW/CLOSE/VOLUME/SECID/currencyid)
+    and the pump-and-dump table in the datasets/pnd_token_date.parquet layout (token, p_date).
+    :rtype: tuple[pd.DataFrame, pd.DataFrame]
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=n_sessions)
+    secids = np.array([f"S{i:04d}" for i in range(n_securities)])
+
+    log_ret = rng.normal(0.0002, 0.02, size=(n_sessions, n_securities))
+    volume = rng.lognormal(10, 0.5, size=(n_sessions, n_securities))
+
+    n_pumps = rng.poisson(pumps_per_security * n_securities)
+    pump_sec = rng.integers(0, n_securities, size=n_pumps)
+    pump_start = rng.integers(40, n_sessions - 20, size=n_pumps)
+    pump_ret = np.log1p(rng.uniform(0.25, 0.35, size=(n_pumps, 3)))
+    dump_ret = np.log1p(rng.uniform(-0.2, -0.1, size=(n_pumps, 5)))
+    for k in range(3):
+        log_ret[pump_start + k, pump_sec] = pump_ret[:, k]
+        volume[pump_start + k, pump_sec] *= 10
+    for k in range(5):
+        log_ret[pump_start + 3 + k, pump_sec] = dump_ret[:, k]
+
+    close = 100 * np.exp(np.cumsum(log_ret, axis=0))
+    open_ = np.vstack([close[:1], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.01, size=close.shape))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+
+    df = pd.DataFrame(
+        {
+            "TRADEDATE": np.repeat(dates.values, n_securities),
+            "OPEN": open_.ravel(),
+            "HIGH": high.ravel(),
+            "LOW": low.ravel(),
+            "CLOSE": close.ravel(),
+            "VOLUME": volume.ravel().round(),
+            "SECID": np.tile(secids, n_sessions),
+            "currencyid": "SUR",
+        }
+    )
+    # Events are dated at the last pump session, close to when MOEX reacts with news
+    events = pd.DataFrame(
+        {"token": secids[pump_sec], "p_date": dates[pump_start + 2]}
+    )
+    events = events.groupby("token")["p_date"].apply(list).reset_index()
+    return df, events
+
+
+def generate_comments(
+    n_comments: int = 100_000,
+    n_tokens: int = 100,
+    n_days: int = 1_000,
+    n_users: int = 5_000,
+    start: str = "2019-01-01",
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Generate forum comments in the layout of preprocess_comment_data output.
+
+    Texts are random word sequences, one in ten comments is a lightly edited copy of one of a few
+    spam templates, posted by different users.
+
+    :param n_comments: Number of comments, defaults to 100_000.
+    :type n_comments: int, optional
+    :param n_tokens: Number of securities, named like generate_ohlcv SECIDs, defaults to 100.
+    :type n_tokens: int, optional
+    :param n_days: Calendar days covered, defaults to 1_000.
+    :type n_days: int, optional
+    :param n_users: Number of distinct users, defaults to 5_000.
+    :type n_users: int, optional
+    :param start: First day, defaults to "2019-01-01".
+    :type start: str, optional
+    :param seed: Random seed, defaults to 42.
+    :type seed: int, optional
+    :return: Comments with token, comment_datetime (Europe/Moscow), user_id, comment_score
+    and comment_text columns, sorted by time.
+    :rtype: pd.DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(2_000)])
+    templates = [
+        " ".join(rng.choice(vocabulary, size=30)) + " target 100% soon"
+        for _ in range(20)
+    ]
+    texts = [
+        " ".join(words)
+        for words in rng.choice(vocabulary, size=(n_comments, 12)).tolist()
+    ]
+    spam = np.flatnonzero(rng.random(n_comments) < 0.1)
+    for i, template in zip(spam, rng.integers(0, len(templates), size=len(spam))):
+        texts[i] = templates[template] + f" {rng.integers(100)}"
+    offsets = pd.to_timedelta(np.sort(rng.uniform(0, n_days, n_comments)), unit="D")
+    return pd.DataFrame(
+        {
+            "token": rng.choice([f"S{i:04d}" for i in range(n_tokens)], n_comments),
+            "comment_datetime": pd.Timestamp(start, tz="Europe/Moscow") + offsets,
+            "user_id": rng.integers(0, n_users, n_comments).astype(str),
+            "comment_score": rng.integers(-5, 20, n_comments),
+            "comment_text": texts,
+        }
+    )
+
+
+def security_series(df: pd.DataFrame, col: str = "CLOSE") -> dict:
+    """
+    Split candles into one date-indexed series per security, the input anomaly_detect expects.
+
+    :param df: Candles from generate_ohlcv.
+    :type df: pd.DataFrame
+    :param col: Value column, defaults to "CLOSE".
+    :type col: str, optional
+    :return: Dictionary SECID -> pd.Series.
+    :rtype: dict
+    """
+    return {
+        secid: group.set_index("TRADEDATE")[col]
+        for secid, group in df.groupby("SECID", sort=False)
+    }
+
+
+def read_fixture(name: str, copies: int = 1) -> str:
+    """
+    Read a recorded HTML page, optionally repeating its comment block to get a bigger page.
+
+    :param name: Fixture file name.
+    :type name: str
+    :param copies: Number of times the page body is repeated, defaults to 1.
+    :type copies: int, optional
+    :return: HTML text.
+    :rtype: str
+    """
+    with open(os.path.join(FIXTURES_DIR, name), encoding="UTF-8") as file:
+        html = file.read()
+    if copies == 1:
+        return html
+    head, body = html.split("<body>", 1)
+    body, tail = body.rsplit("</body>", 1)
+    return head + "<body>" + body * copies + "</body>" + tail
+
+
+class FakeResponse:
+    """Minimal stand-in for httpx.Response, only the attributes the scraper reads."""
+
+    def __init__(self, text: str, url: str = "https://smart-lab.ru/forum/TEST/page1"):
+        self.text = text
+        self.url = url
+        self.content = text.encode("UTF-8")
@@ -0,0 +1,343 @@
+import numpy as np
+import pandas as pd
+
+# Bits of the (token, session, user) key used to count distinct commenters
+_SESSION_BITS = 16
+_USER_BITS = 32
+
+
+def comment_sessions(
+    datetimes: pd.Series, sessions: pd.DatetimeIndex, tz: str = "Europe/Moscow"
+) -> np.ndarray:
+    """
+    Assign comments to trading sessions: a comment counts for the first session on or after
+    its local calendar date, so weekend and holiday activity lands on the next session.
+
+    :param datetimes: Comment times, tz-aware or naive local times.
+    :type datetimes: pd.Series
+    :param sessions: Session dates.
+    :type sessions: pd.DatetimeIndex
+    :param tz: Time zone of the sessions, defaults to "Europe/Moscow".
+    :type tz: str, optional
+    :return: Session positions, -1 for comments before the first or after the last session.
+    :rtype: np.ndarray
+    """
+    days = _comment_days(datetimes, tz)
+    sessions = pd.DatetimeIndex(sessions).as_unit("ns")
+    positions = sessions.searchsorted(days)
+    positions[positions == len(sessions)] = -1
+    if len(sessions):
+        # Older history would otherwise pile up in the first session
+        positions[days < sessions[0].to_datetime64()] = -1
+    return positions
+
+
+def _comment_days(datetimes: pd.Series, tz: str) -> np.ndarray:
+    """Local calendar dates of comments as datetime64[ns]."""
+    times = pd.DatetimeIndex(datetimes)
+    if times.tz is not None:
+        times = times.tz_convert(tz).tz_localize(None)
+    return times.normalize().as_unit("ns").to_numpy()
+
+
+def session_counts(
+    df: pd.DataFrame,
+    sessions: pd.DatetimeIndex,
+    tokens: list = None,
+    token_col: str = "token",
+    datetime_col: str = "comment_datetime",
+    tz: str = "Europe/Moscow",
+) -> tuple[np.ndarray, list]:
+    """
+    Count comments per token per session with one bincount.
+
+    :param df: Comments from preprocess_comment_data or CommentStore.to_frame().
+    :type df: pd.DataFrame
+    :param sessions: Session dates.
+    :type sessions: pd.DatetimeIndex
+    :param tokens: Row order of the result, defaults to the sorted tokens of df.
+    :type tokens: list, optional
+    :param token_col: Column name for tokens, defaults to "token".
+    :type token_col: str, optional
+    :param datetime_col: Column name for comment times, defaults to "comment_datetime".
+    :type datetime_col: str, optional
+    :param tz: Time zone of the sessions, defaults to "Europe/Moscow".
+    :type tz: str, optional
+    :return: Tokens x sessions int64 counts and the tokens.
+    :rtype: tuple[np.ndarray, list]
+    """
+    if tokens is None:
+        tokens = sorted(df[token_col].dropna().unique())
+    rows = pd.Index(tokens).get_indexer(df[token_col])
+    cols = comment_sessions(df[datetime_col], sessions, tz)
+    keep = (rows >= 0) & (cols >= 0)
+    counts = np.bincount(
+        rows[keep] * len(sessions) + cols[keep], minlength=len(tokens) * len(sessions)
+    )
+    return counts.reshape(len(tokens), len(sessions)).astype(np.int64), list(tokens)
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    return values[np.concatenate([[True], values[1:] != values[:-1]])]
+
+
+class CommentBursts:
+    """
+    Online burst detector for forum activity, aligned with the price sessions.
+
+    Comments are binned per token per session. For every token an exponentially weighted mean
+    and variance of log(1 + count) is kept, and a session is a burst when its z-score against
+    the statistics of the previous sessions is above the threshold. The same is done for the
+    number of distinct commenters, which separates real interest from a few noisy accounts.
+
+    The EWMA state is stored after every session, so add_comments() only recomputes the
+    sessions touched by the new comments, usually the last one or two. Comments after the last
+    known session are kept aside and counted once extend_sessions() adds their session, comments
+    before the first session are ignored.
+
+    Example:
+    bursts = CommentBursts(close.index)
+    bursts.add_comments(comment_df)  # again with every new batch of pages
+    flags = bursts.flag_frame("SBER")  # bool columns indexed like anomaly_detect output
+    anomaly_news_markup_func(df, flags["comment_burst"], news_list)
+    """
+
+    # Metric -> flag column of flag_frame()
+    METRICS = {"comments": "comment_burst", "users": "user_burst"}
+
+    def __init__(
+        self,
+        sessions: pd.DatetimeIndex,
+        halflife: float = 20,
+        threshold: float = 3.0,
+        min_count: int = 5,
+        min_std: float = 0.5,
+        warmup: int = 20,
+        tz: str = "Europe/Moscow",
+        token_col: str = "token",
+        datetime_col: str = "comment_datetime",
+        user_col: str = "user_id",
+    ) -> None:
+        """
+        :param sessions: Session dates, e.g. the index of anomaly_detect output.
+        :type sessions: pd.DatetimeIndex
+        :param halflife: EWMA half-life in sessions, defaults to 20.
+        :type halflife: float, optional
+        :param threshold: Z-score of a burst, defaults to 3.0.
+        :type threshold: float, optional
+        :param min_count: Fewest comments (or commenters) of a burst, defaults to 5.
+        :type min_count: int, optional
+        :param min_std: Floor of the standard deviation of log(1 + count), so the first comments
+        after a quiet period are not divided by zero, defaults to 0.5.
+        :type min_std: float, optional
+        :param warmup: Sessions without flags at the start of the history, defaults to 20.
+        :type warmup: int, optional
+        :param tz: Time zone of the sessions, defaults to "Europe/Moscow".
+        :type tz: str, optional
+        :param token_col: Column name for tokens, defaults to "token".
+        :type token_col: str, optional
+        :param datetime_col: Column name for comment times, defaults to "comment_datetime".
+        :type datetime_col: str, optional
+        :param user_col: Column name for user ids, defaults to "user_id".
+        :type user_col: str, optional
+        """
+        self.sessions = pd.DatetimeIndex(sessions).as_unit("ns")
+        self.alpha = 1 - np.exp(np.log(0.5) / halflife)
+        self.threshold = threshold
+        self.min_count = min_count
+        self.min_var = min_std**2
+        self.warmup = warmup
+        self.tz = tz
+        self.token_col = token_col
+        self.datetime_col = datetime_col
+        self.user_col = user_col
+        self.tokens = []
+        self._token_lookup = {}
+        self._users = pd.Index([])
+        # Sorted unique (token, session, user) keys, see _SESSION_BITS
+        self._user_keys = np.empty(0, dtype=np.int64)
+        n_sessions = len(self.sessions)
+        # Metric -> tokens x sessions arrays
+        self.counts = {m: np.zeros((0, n_sessions), np.int64) for m in self.METRICS}
+        self.zscores = {m: np.zeros((0, n_sessions)) for m in self.METRICS}
+        self._mean = {m: np.zeros((0, n_sessions)) for m in self.METRICS}
+        self._var = {m: np.zeros((0, n_sessions)) for m in self.METRICS}
+        # Comments after the last session, waiting for extend_sessions()
+        self._pending = []
+
+    def _add_tokens(self, tokens: np.ndarray) -> None:
+        new = [token for token in pd.unique(tokens) if token not in self._token_lookup]
+        if not new:
+            return
+        for token in new:
+            self._token_lookup[token] = len(self.tokens)
+            self.tokens.append(token)
+        pad = ((0, len(new)), (0, 0))
+        for m in self.METRICS:
+            self.counts[m] = np.pad(self.counts[m], pad)
+            self.zscores[m] = np.pad(self.zscores[m], pad)
+            self._mean[m] = np.pad(self._mean[m], pad)
+            self._var[m] = np.pad(self._var[m], pad)
+
+    def extend_sessions(self, sessions: pd.DatetimeIndex) -> None:
+        """
+        Add sessions after the last known one, e.g. every new trading day.
+
+        :param sessions: Session dates, dates already known are ignored.
+        :type sessions: pd.DatetimeIndex
+        """
+        sessions = pd.DatetimeIndex(sessions).as_unit("ns")
+        if len(self.sessions):
+            sessions = sessions[sessions > self.sessions[-1]]
+        if sessions.empty:
+            return
+        first = len(self.sessions)
+        self.sessions = self.sessions.append(sessions.sort_values())
+        pad = ((0, 0), (0, len(sessions)))
+        for m in self.METRICS:
+            self.counts[m] = np.pad(self.counts[m], pad)
+            self.zscores[m] = np.pad(self.zscores[m], pad)
+            self._mean[m] = np.pad(self._mean[m], pad)
+            self._var[m] = np.pad(self._var[m], pad)
+        if self._pending:
+            pending = pd.concat(self._pending)
+            self._pending = []
+            self._count(pending)
+        self._recompute(first)
+
+    def add_comments(self, df: pd.DataFrame) -> None:
+        """
+        Count a new batch of comments and update the statistics from the first session it touches.
+
+        Comments are counted as given, pass every comment once. Comments after the last session
+        are counted when extend_sessions() adds it, comments before the first one are ignored.
+
+        :param df: Comments from preprocess_comment_data or CommentStore.to_frame().
+        :type df: pd.DataFrame
+        """
+        first = self._count(df)
+        if first is not None:
+            self._recompute(first)
+
+    def _count(self, df: pd.DataFrame) -> int:
+        """Add comments to the counts, return the first session touched or None."""
+        df = df[[self.token_col, self.datetime_col, self.user_col]]
+        cols = comment_sessions(df[self.datetime_col], self.sessions, self.tz)
+        keep = cols >= 0
+        # Comments before the first session are dropped, comments without a time never get one
+        later = ~keep
+        if len(self.sessions):
+            days = _comment_days(df[self.datetime_col], self.tz)
+            later &= days > self.sessions[-1].to_datetime64()
+        else:
+            later &= df[self.datetime_col].notna().to_numpy()
+        if later.any():
+            self._pending.append(df[later])
+        if not keep.any():
+            return None
+        df, cols = df[keep], cols[keep]
+        self._add_tokens(df[self.token_col].to_numpy())
+        rows = pd.Index(self.tokens).get_indexer(df[self.token_col])
+        n_sessions = len(self.sessions)
+        size = len(self.tokens) * n_sessions
+        self.counts["comments"] += np.bincount(
+            rows * n_sessions + cols, minlength=size
+        ).reshape(len(self.tokens), n_sessions)
+
+        # Distinct users: new (token, session, user) keys are the ones that add a commenter
+        users = df[self.user_col].fillna("").to_numpy()
+        new_users = pd.Index(pd.unique(users)).difference(self._users)
+        self._users = self._users.append(new_users)
+        keys = (
+            (rows.astype(np.int64) << (_SESSION_BITS + _USER_BITS))
+            | (cols.astype(np.int64) << _USER_BITS)
+            | self._users.get_indexer(users).astype(np.int64)
+        )
+        keys = _sorted_unique(keys)
+        known = self._user_keys
+        pos = np.searchsorted(known, keys)
+        is_known = pos < len(known)
+        is_known[is_known] = known[pos[is_known]] == keys[is_known]
+        keys = keys[~is_known]
+        self._user_keys = np.insert(known, pos[~is_known], keys)
+        flat = (keys >> (_SESSION_BITS + _USER_BITS)) * n_sessions + (
+            (keys >> _USER_BITS) & ((1 << _SESSION_BITS) - 1)
+        )
+        self.counts["users"] += np.bincount(flat, minlength=size).reshape(
+            len(self.tokens), n_sessions
+        )
+        return int(cols.min())
+
+    def _recompute(self, first: int) -> None:
+        """Run the EWMA recurrence from session first on, vectorized over tokens."""
+        alpha = self.alpha
+        for m in self.METRICS:
+            values = np.log1p(self.counts[m])
+            mean, var, z = self._mean[m], self._var[m], self.zscores[m]
+            prev_mean = mean[:, first - 1] if first else np.zeros(len(values))
+            prev_var = var[:, first - 1] if first else np.zeros(len(values))
+            for s in range(first, values.shape[1]):
+                x = values[:, s]
+                z[:, s] = (x - prev_mean) / np.sqrt(np.maximum(prev_var, self.min_var))
+                diff = x - prev_mean
+                prev_mean = prev_mean + alpha * diff
+                prev_var = (1 - alpha) * (prev_var + alpha * diff**2)
+                mean[:, s], var[:, s] = prev_mean, prev_var
+
+    def flags(self, metric: str = "comments") -> np.ndarray:
+        """
+        Burst flags of all tokens.
+
+        :param metric: "comments" or "users", defaults to "comments".
+        :type metric: str, optional
+        :return: Tokens x sessions bool array.
+        :rtype: np.ndarray
+        """
+        flags = (self.zscores[metric] > self.threshold) & (
+            self.counts[metric] >= self.min_count
+        )
+        flags[:, : self.warmup] = False
+        return flags
+
+    def flag_frame(self, token: str, date_col: str = "TRADEDATE") -> pd.DataFrame:
+        """
+        Burst flags of one token in the layout of anomaly_detect output, ready for
+        anomaly_news_markup_func and gather_all_visuals.
+
+        :param token: Security token.
+        :type token: str
+        :param date_col: Name of the date index, defaults to "TRADEDATE".
+        :type date_col: str, optional
+        :return: DataFrame with comment_burst and user_burst bool columns and a session index,
+        all False for a token without comments.
+        :rtype: pd.DataFrame
+        """
+        row = self._token_lookup.get(token)
+        index = self.sessions.rename(date_col)
+        if row is None:
+            return pd.DataFrame(
+                {column: False for column in self.METRICS.values()}, index=index
+            )
+        return pd.DataFrame(
+            {column: self.flags(m)[row] for m, column in self.METRICS.items()},
+            index=index,
+        )
+
+    def activity_frame(self, token: str, date_col: str = "TRADEDATE") -> pd.DataFrame:
+        """
+        Counts and z-scores of one token, e.g. to plot next to the prices.
+
+        :param token: Security token.
+        :type token: str
+        :param date_col: Name of the date index, defaults to "TRADEDATE".
+        :type date_col: str, optional
+        :return: DataFrame with comments, users, comments_z and users_z columns.
+        :rtype: pd.DataFrame
+        """
+        row = self._token_lookup[token]
+        data = {}
+        for m in self.METRICS:
+            data[m] = self.counts[m][row]
+            data[f"{m}_z"] = self.zscores[m][row]
+        return pd.DataFrame(data, index=self.sessions.rename(date_col))
@@ -0,0 +1,309 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Repeated strings are dictionary encoded: int32 codes + a sorted list of categories, -1 for missing
+CATEGORICAL_COLUMNS = ("token", "user_id", "url", "comment_misc")
+INT_COLUMNS = ("comment_score", "user_score")
+BOOL_COLUMNS = ("badges",)
+INT32_NA = np.iinfo(np.int32).min
+INT64_NA = np.iinfo(np.int64).min
+
+_HEADER_FILE = "header.json"
+_VERSION = 1
+
+
+class CommentStore:
+    """
+    Compact column store for forum comments produced by preprocess_comment_data.
+
+    Rows are sorted by (token, comment time). Strings repeated on every row are dictionary encoded,
+    timestamps are int64 nanoseconds since epoch (UTC), scores are int32 and all comment texts live in
+    one UTF-8 buffer with row offsets. A per-token offsets array is the sparse index, so selecting
+    the comments of one token in a time range is two binary searches instead of a scan.
+    """
+
+    def __init__(self, arrays: dict, categories: dict) -> None:
+        """
+        Build a store from already encoded arrays. Use from_frame() or load() instead.
+
+        :param arrays: Encoded column arrays, see from_frame() for the names.
+        :type arrays: dict
+        :param categories: Column name -> array of categories for dictionary-encoded columns.
+        :type categories: dict
+        """
+        self.arrays = arrays
+        self.categories = categories
+        self._token_lookup = {
+            token: i for i, token in enumerate(categories["token"].tolist())
+        }
+
+    def __len__(self) -> int:
+        return len(self.arrays["comment_datetime"])
+
+    @property
+    def tokens(self) -> list:
+        return self.categories["token"].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the encoded columns in bytes (categories excluded).
+        """
+        return sum(arr.nbytes for arr in self.arrays.values())
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        token_col: str = "token",
+        datetime_col: str = "comment_datetime",
+        text_col: str = "comment_text",
+    ) -> "CommentStore":
+        """
+        Encode a comment DataFrame.
+
+        :param df: Comment data, e.g. the output of preprocess_comment_data.
+        :type df: pd.DataFrame
+        :param token_col: Column name for tokens, defaults to "token".
+        :type token_col: str, optional
+        :param datetime_col: Column name for comment datetimes, defaults to "comment_datetime".
+        :type datetime_col: str, optional
+        :param text_col: Column name for comment texts, defaults to "comment_text".
+        :type text_col: str, optional
+        :return: Encoded comment store.
+        :rtype: CommentStore
+        """
+        df = df.rename(
+            columns={
+                token_col: "token",
+                datetime_col: "comment_datetime",
+                text_col: "comment_text",
+            }
+        )
+        arrays = {}
+        categories = {}
+        for col in CATEGORICAL_COLUMNS:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            arrays[col] = codes.astype(np.int32)
+            categories[col] = np.asarray(uniques, dtype=object)
+        if "token" not in arrays:
+            raise KeyError(f"Token column '{token_col}' not found")
+
+        timestamps = pd.DatetimeIndex(
+            pd.to_datetime(df["comment_datetime"], utc=True)
+        ).as_unit("ns")
+        time_ns = timestamps.asi8.copy()
+        time_ns[timestamps.isna()] = INT64_NA
+        arrays["comment_datetime"] = time_ns
+        for col in INT_COLUMNS:
+            if col in df.columns:
+                values = pd.to_numeric(df[col])
+                arrays[col] = values.fillna(INT32_NA).to_numpy(dtype=np.int32)
+        for col in BOOL_COLUMNS:
+            if col in df.columns:
+                arrays[col] = df[col].fillna(False).to_numpy(dtype=bool)
+
+        # Sort by (token, time) once, the sparse index relies on it
+        order = np.lexsort((arrays["comment_datetime"], arrays["token"]))
+        arrays = {col: arr[order] for col, arr in arrays.items()}
+
+        texts = df["comment_text"].to_numpy(dtype=object)[order]
+        arrays["comment_text_na"] = pd.isna(texts)
+        encoded = [
+            b"" if na else text.encode("UTF-8")
+            for text, na in zip(texts, arrays["comment_text_na"])
+        ]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        arrays["text_offsets"] = offsets
+        arrays["text_buffer"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        arrays["token_offsets"] = np.searchsorted(
+            arrays["token"], np.arange(len(categories["token"]) + 1)
+        ).astype(np.int64)
+        return cls(arrays, categories)
+
+    def token_rows(self, token: str) -> tuple[int, int]:
+        """
+        Get the row range of a token from the sparse index.
+
+        :param token: Token name.
+        :type token: str
+        :return: Start and end (exclusive) row positions, (0, 0) for unknown tokens.
+        :rtype: tuple[int, int]
+        """
+        code = self._token_lookup.get(token)
+        if code is None:
+            return 0, 0
+        offsets = self.arrays["token_offsets"]
+        return int(offsets[code]), int(offsets[code + 1])
+
+    def rows(
+        self,
+        token: str,
+        start: any = None,
+        end: any = None,
+        tz: str = "Europe/Moscow",
+    ) -> tuple[int, int]:
+        """
+        Get the row range of a token's comments within [start, end).
+
+        :param token: Token name.
+        :type token: str
+        :param start: Start of the time range, anything pd.Timestamp accepts, naive values are in tz. Defaults to None.
+        :type start: any, optional
+        :param end: End of the time range (exclusive), defaults to None.
+        :type end: any, optional
+        :param tz: Time zone of naive start and end, defaults to "Europe/Moscow".
+        :type tz: str, optional
+        :return: Start and end (exclusive) row positions.
+        :rtype: tuple[int, int]
+        """
+        lo, hi = self.token_rows(token)
+        times = self.arrays["comment_datetime"][lo:hi]
+        if start is not None:
+            lo_shift = np.searchsorted(times, _to_ns(start, tz), side="left")
+        else:
+            lo_shift = 0
+        if end is not None:
+            hi = lo + np.searchsorted(times, _to_ns(end, tz), side="left")
+        return lo + int(lo_shift), int(hi)
+
+    def query(
+        self,
+        token: str,
+        start: any = None,
+        end: any = None,
+        tz: str = "Europe/Moscow",
+    ) -> pd.DataFrame:
+        """
+        Select a token's comments within [start, end).
+
+        For example, all comments for ALBK in the week before a date:
+        store.query("ALBK", date - pd.Timedelta(days=7), date)
+
+        :param token: Token name.
+        :type token: str
+        :param start: Start of the time range, naive values are in tz, defaults to None.
+        :type start: any, optional
+        :param end: End of the time range (exclusive), defaults to None.
+        :type end: any, optional
+        :param tz: Time zone of naive start and end and of the returned comment_datetime column,
+        defaults to "Europe/Moscow".
+        :type tz: str, optional
+        :return: Decoded comments.
+        :rtype: pd.DataFrame
+        """
+        lo, hi = self.rows(token, start, end, tz)
+        return self._decode(lo, hi, tz)
+
+    def to_frame(self, tz: str = "Europe/Moscow") -> pd.DataFrame:
+        """
+        Decode the whole store. String columns come back as pandas categoricals.
+
+        :param tz: Time zone of the returned comment_datetime column, defaults to "Europe/Moscow".
+        :type tz: str, optional
+        :return: Decoded comments.
+        :rtype: pd.DataFrame
+        """
+        return self._decode(0, len(self), tz)
+
+    def texts(self, lo: int, hi: int) -> list:
+        """
+        Decode comment texts for a row range.
+
+        :param lo: Start row.
+        :type lo: int
+        :param hi: End row (exclusive).
+        :type hi: int
+        :return: List of texts, None for missing ones.
+        :rtype: list
+        """
+        offsets = self.arrays["text_offsets"][lo : hi + 1]
+        buffer = self.arrays["text_buffer"][offsets[0] : offsets[-1]].tobytes()
+        rel = (offsets - offsets[0]).tolist()
+        na = self.arrays["comment_text_na"][lo:hi]
+        return [
+            None if na[i] else buffer[rel[i] : rel[i + 1]].decode("UTF-8")
+            for i in range(hi - lo)
+        ]
+
+    def _decode(self, lo: int, hi: int, tz: str) -> pd.DataFrame:
+        data = {"comment_text": self.texts(lo, hi)}
+        for col in INT_COLUMNS:
+            if col in self.arrays:
+                values = np.array(self.arrays[col][lo:hi])
+                data[col] = pd.arrays.IntegerArray(values, values == INT32_NA)
+        # INT64_NA is the NaT bit pattern, so the view handles missing values too
+        times = self.arrays["comment_datetime"][lo:hi].view("datetime64[ns]")
+        data["comment_datetime"] = (
+            pd.DatetimeIndex(times).tz_localize("UTC").tz_convert(tz)
+        )
+        for col in BOOL_COLUMNS:
+            if col in self.arrays:
+                data[col] = self.arrays[col][lo:hi]
+        for col in CATEGORICAL_COLUMNS:
+            if col in self.arrays:
+                data[col] = pd.Categorical.from_codes(
+                    self.arrays[col][lo:hi], categories=self.categories[col]
+                )
+        return pd.DataFrame(data)
+
+    def save(self, path: str) -> None:
+        """
+        Save the store as a directory of .npy files plus a JSON header with the categories.
+
+        :param path: Directory path, created if missing.
+        :type path: str
+        """
+        os.makedirs(path, exist_ok=True)
+        for col, arr in self.arrays.items():
+            np.save(os.path.join(path, f"{col}.npy"), arr)
+        header = dict(
+            version=_VERSION,
+            n_rows=len(self),
+            columns=list(self.arrays),
+            categories={col: cats.tolist() for col, cats in self.categories.items()},
+        )
+        with open(os.path.join(path, _HEADER_FILE), mode="w", encoding="UTF-8") as file:
+            json.dump(header, file, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CommentStore":
+        """
+        Load a store saved with save().
+
+        :param path: Directory path.
+        :type path: str
+        :param mmap: Memory-map the arrays instead of reading them, defaults to True.
+        :type mmap: bool, optional
+        :return: Comment store.
+        :rtype: CommentStore
+        """
+        with open(os.path.join(path, _HEADER_FILE), encoding="UTF-8") as file:
+            header = json.load(file)
+        if header["version"] != _VERSION:
+            raise ValueError(f"Unsupported comment store version: {header['version']}")
+        arrays = {
+            col: np.load(
+                os.path.join(path, f"{col}.npy"), mmap_mode="r" if mmap else None
+            )
+            for col in header["columns"]
+        }
+        categories = {
+            col: np.asarray(cats, dtype=object)
+            for col, cats in header["categories"].items()
+        }
+        return cls(arrays, categories)
+
+
+def _to_ns(value: any, tz: str) -> int:
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(tz)
+    return ts.as_unit("ns").value
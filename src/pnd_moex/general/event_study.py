@@ -0,0 +1,218 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+FIELDS = ("OPEN", "HIGH", "LOW", "CLOSE", "VOLUME")
+
+
+def price_panel(
+    df: pd.DataFrame,
+    fields: tuple = FIELDS,
+    date_col: str = "TRADEDATE",
+    secid_col: str = "SECID",
+) -> tuple[dict, pd.DatetimeIndex, pd.Index]:
+    """
+    Pivot candles in the long history layout into one sessions x securities array per field.
+
+    PriceMatrix gives the same layout without the pivot: {field: matrix.field(field)}, matrix.dates, matrix.secids.
+
+    :param df: Candles with date, SECID and field columns.
+    :type df: pd.DataFrame
+    :param fields: Fields to pivot, defaults to FIELDS.
+    :type fields: tuple, optional
+    :param date_col: Name of the date column, defaults to "TRADEDATE".
+    :type date_col: str, optional
+    :param secid_col: Name of the security column, defaults to "SECID".
+    :type secid_col: str, optional
+    :return: Field -> array, session dates and SECIDs.
+    :rtype: tuple[dict, pd.DatetimeIndex, pd.Index]
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(df[date_col]).unique()).sort_values()
+    secids = pd.Index(df[secid_col].unique()).sort_values()
+    rows = dates.get_indexer(pd.to_datetime(df[date_col]))
+    cols = secids.get_indexer(df[secid_col])
+    panel = {}
+    for field in fields:
+        values = np.full((len(dates), len(secids)), np.nan)
+        values[rows, cols] = df[field].to_numpy(dtype=np.float64)
+        panel[field] = values
+    return panel, dates, secids
+
+
+def event_positions(
+    events: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+    secids: pd.Index,
+    token_col: str = "token",
+    date_col: str = "p_date",
+) -> pd.DataFrame:
+    """
+    Locate events on the sessions x securities grid.
+
+    An event dated off a session is put on the previous session. Events of unknown tokens,
+    before the first session or on/after the business day following the last session (the
+    panel ends before them) are dropped.
+
+    :param events: Events table, e.g. datasets/pnd_token_date.parquet; date_col may hold single dates or lists of dates.
+    :type events: pd.DataFrame
+    :param dates: Session dates.
+    :type dates: pd.DatetimeIndex
+    :param secids: Security ids.
+    :type secids: pd.Index
+    :param token_col: Column name for tokens, defaults to "token".
+    :type token_col: str, optional
+    :param date_col: Column name for event dates, defaults to "p_date".
+    :type date_col: str, optional
+    :return: One row per event with token, date_col, session, row and col columns.
+    :rtype: pd.DataFrame
+    """
+    exploded = events[[token_col, date_col]].explode(date_col).dropna()
+    event_dates = pd.to_datetime(exploded[date_col])
+    cols = pd.Index(secids).get_indexer(exploded[token_col])
+    rows = dates.searchsorted(event_dates, side="right") - 1
+    keep = (cols >= 0) & (rows >= 0)
+    if len(dates):
+        # A weekend after the last session still belongs to it, a later day is off the panel
+        keep &= (event_dates.dt.normalize() < dates[-1] + BDay(1)).to_numpy()
+    result = exploded[keep].reset_index(drop=True)
+    result[date_col] = event_dates[keep].to_numpy()
+    result["session"] = dates[rows[keep]]
+    result["row"] = rows[keep]
+    result["col"] = cols[keep]
+    return result
+
+
+def extract_event_windows(
+    events: pd.DataFrame,
+    panel: dict,
+    dates: pd.DatetimeIndex,
+    secids: pd.Index,
+    before: int = 10,
+    after: int = 10,
+    fields: tuple = None,
+    token_col: str = "token",
+    date_col: str = "p_date",
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    Cut price/volume windows around every event with one vectorized gather per field.
+
+    For example:
+    panel, dates, secids = price_panel(df)
+    windows, located = extract_event_windows(pnd_df, panel, dates, secids, before=20, after=10)
+    closes = windows[:, :, 3]  # event x relative session
+
+    :param events: Events table with token and date (or list of dates) columns.
+    :type events: pd.DataFrame
+    :param panel: Field -> sessions x securities array, from price_panel or PriceMatrix.field.
+    :type panel: dict
+    :param dates: Session dates of the panel.
+    :type dates: pd.DatetimeIndex
+    :param secids: Security ids of the panel.
+    :type secids: pd.Index
+    :param before: Sessions before the event, defaults to 10.
+    :type before: int, optional
+    :param after: Sessions after the event, defaults to 10.
+    :type after: int, optional
+    :param fields: Fields to extract, defaults to every field of the panel.
+    :type fields: tuple, optional
+    :param token_col: Column name for tokens, defaults to "token".
+    :type token_col: str, optional
+    :param date_col: Column name for event dates, defaults to "p_date".
+    :type date_col: str, optional
+    :return: Array event x relative session (-before..after) x field, NaN outside the data,
+    and the located events table (see event_positions), aligned with the first axis.
+    :rtype: tuple[np.ndarray, pd.DataFrame]
+    """
+    fields = tuple(panel) if fields is None else tuple(fields)
+    located = event_positions(events, dates, secids, token_col, date_col)
+    offsets = np.arange(-before, after + 1)
+    rows = located["row"].to_numpy()[:, None] + offsets[None, :]
+    cols = np.broadcast_to(located["col"].to_numpy()[:, None], rows.shape)
+    inside = (rows >= 0) & (rows < len(dates))
+    rows = np.clip(rows, 0, len(dates) - 1)
+
+    windows = np.empty(rows.shape + (len(fields),), dtype=np.float64)
+    for i, field in enumerate(fields):
+        windows[:, :, i] = panel[field][rows, cols]
+    windows[~inside] = np.nan
+    return windows, located
+
+
+def relative_sessions(before: int = 10, after: int = 10) -> pd.Index:
+    """
+    Index of the second axis of extract_event_windows output.
+
+    :param before: Sessions before the event, defaults to 10.
+    :type before: int, optional
+    :param after: Sessions after the event, defaults to 10.
+    :type after: int, optional
+    :return: Relative session numbers, 0 is the event session.
+    :rtype: pd.Index
+    """
+    return pd.Index(np.arange(-before, after + 1), name="relative_session")
+
+
+def normalized_returns(prices: np.ndarray, reference: int) -> np.ndarray:
+    """
+    Cumulative returns of every event window relative to one reference session.
+
+    :param prices: Prices, event x relative session, e.g. windows[:, :, fields.index("CLOSE")].
+    :type prices: np.ndarray
+    :param reference: Position of the reference session on the second axis, e.g. 0 for the window start.
+    :type reference: int
+    :return: prices / prices[:, reference] - 1.
+    :rtype: np.ndarray
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return prices / prices[:, reference : reference + 1] - 1
+
+
+def abnormal_volume(volume: np.ndarray, estimation: slice) -> np.ndarray:
+    """
+    Volume relative to its mean over an estimation period of the same window.
+
+    :param volume: Volumes, event x relative session.
+    :type volume: np.ndarray
+    :param estimation: Positions of the estimation sessions on the second axis, e.g. slice(0, 5).
+    :type estimation: slice
+    :return: volume / mean(volume[:, estimation]) - 1.
+    :rtype: np.ndarray
+    """
+    with warnings.catch_warnings():
+        # Events without data in the estimation period get NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        baseline = np.nanmean(volume[:, estimation], axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return volume / baseline - 1
+
+
+def aggregate_events(values: np.ndarray, index: pd.Index = None) -> pd.DataFrame:
+    """
+    Cross-event statistics for every relative session.
+
+    :param values: Event x relative session array, e.g. from normalized_returns.
+    :type values: np.ndarray
+    :param index: Index for the result, e.g. relative_sessions(before, after), defaults to positions.
+    :type index: pd.Index, optional
+    :return: DataFrame with mean, median, std, q25, q75 and count columns.
+    :rtype: pd.DataFrame
+    """
+    with warnings.catch_warnings():
+        # Relative sessions without data get NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q25, median, q75 = np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+    return pd.DataFrame(
+        dict(
+            mean=mean,
+            median=median,
+            std=std,
+            q25=q25,
+            q75=q75,
+            count=np.sum(~np.isnan(values), axis=0),
+        ),
+        index=index,
+    )
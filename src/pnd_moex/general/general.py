@@ -1,11 +1,31 @@
 import numpy as np
 import pandas as pd
-from adtk.detector import PersistAD, QuantileAD, VolatilityShiftAD
 from pandas.tseries.offsets import BDay
 
+from pnd_moex.util import memo, profiling
+from pnd_moex.util.lazy import lazy_import
 from pnd_moex.util.other import find_all_sequences
 
+# ADTK pulls in its whole scientific stack, only load it when an ADTK method is requested
+detector = lazy_import("adtk.detector")
 
+# Part of the memoization keys, bump when anomaly_detect or anomaly_news_markup_func
+# change their results
+DETECTOR_VERSION = 1
+
+
+def _detector_version() -> tuple:
+    """Memoization version of anomaly_detect, a new ADTK release invalidates its results too."""
+    from importlib import metadata
+
+    try:
+        return DETECTOR_VERSION, metadata.version("adtk")
+    except metadata.PackageNotFoundError:
+        return DETECTOR_VERSION, None
+
+
+@profiling.timed("anomaly_detect")
+@memo.memoize(version=_detector_version)
 def anomaly_detect(
     ts: pd.Series,
     quantile: bool = True,
@@ -20,6 +40,7 @@ def anomaly_detect(
     :return: DataFrame with columns representing different detection methods and the same datetime index.
     :rtype: pd.DataFrame
     """
+    profiling.increment("bars_scored", len(ts))
     # Calculate shifted percentage values
     pct_lag1 = ts.pct_change()
     pct_lag2 = ts.shift(-1).pct_change()
@@ -51,15 +72,17 @@ def anomaly_detect(
     # Use ADTK tools to detect anomalies
     # Quantile AD
     if quantile:
-        q_ad = QuantileAD(high=0.99, low=0)
+        q_ad = detector.QuantileAD(high=0.99, low=0)
         df["quantile"] = q_ad.fit_detect(pct_lag1)
     if persist:
         # Persist AD
-        persist_ad = PersistAD(30, c=5.0, side="positive")
+        persist_ad = detector.PersistAD(30, c=5.0, side="positive")
         df["persist"] = persist_ad.fit_detect(ts)
     if volatility:
         # Volatility AD
-        volatility_shift_ad = VolatilityShiftAD(c=6.0, side="positive", window=30)
+        volatility_shift_ad = detector.VolatilityShiftAD(
+            c=6.0, side="positive", window=30
+        )
         df["volatility"] = volatility_shift_ad.fit_detect(ts)
 
     # Filling NA with False
@@ -68,6 +91,8 @@ def anomaly_detect(
     return df
 
 
+@profiling.timed("anomaly_news_markup")
+@memo.memoize(version=DETECTOR_VERSION)
 def anomaly_news_markup_func(
     df: pd.DataFrame,
     anomaly_map: pd.Series,
@@ -99,6 +124,7 @@ def anomaly_news_markup_func(
     freqed_df["anomaly"] = anomaly_map.asfreq("B")
     freqed_df["mark"] = 0
     n, _ = freqed_df.shape
+    profiling.increment("bars_labelled", n)
     # Detect all NaN and anomalies and mark them as -1
     a_n_list = find_all_sequences(
         freqed_df["anomaly"], lambda x: x is True
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import os
+
+import pandas as pd
+
+from pnd_moex.util import profiling
+from pnd_moex.util.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+ISS_URL = "https://iss.moex.com/iss"
+HISTORY_COLUMNS = ["TRADEDATE", "OPEN", "HIGH", "LOW", "CLOSE", "VOLUME", "SECID"]
+PRICE_COLUMNS = ["OPEN", "HIGH", "LOW", "CLOSE", "VOLUME"]
+
+
+async def _get_json(
+    client: httpx.AsyncClient, url: str, params: dict, retries: int = 3
+) -> dict:
+    for attempt in range(retries):
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            profiling.increment("pages_fetched")
+            return response.json()
+        except httpx.HTTPError:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(2**attempt)
+
+
+def _block_frame(payload: dict, name: str) -> pd.DataFrame:
+    return pd.DataFrame(payload[name]["data"], columns=payload[name]["columns"])
+
+
+async def _get_paged(
+    client: httpx.AsyncClient, url: str, params: dict, name: str
+) -> pd.DataFrame:
+    """
+    Fetch every page of an ISS block: the first page gives the cursor, the rest are fetched concurrently.
+    """
+    params = dict(params, **{"iss.meta": "off", "iss.only": f"{name},{name}.cursor"})
+    first = await _get_json(client, url, dict(params, start=0))
+    _, total, page_size = first[f"{name}.cursor"]["data"][0]
+    rest = await asyncio.gather(
+        *[
+            _get_json(client, url, dict(params, start=start))
+            for start in range(page_size, total, page_size)
+        ]
+    )
+    return pd.concat([_block_frame(page, name) for page in [first, *rest]])
+
+
+async def load_board_securities(
+    client: httpx.AsyncClient,
+    engine: str = "stock",
+    market: str = "shares",
+    board: str = "TQBR",
+) -> pd.DataFrame:
+    """
+    Get the list of securities traded on a board.
+
+    :param client: Async HTTP client.
+    :type client: httpx.AsyncClient
+    :param engine: ISS engine, defaults to "stock".
+    :type engine: str, optional
+    :param market: ISS market, defaults to "shares".
+    :type market: str, optional
+    :param board: ISS board, defaults to "TQBR".
+    :type board: str, optional
+    :return: DataFrame with SECID and currencyid columns.
+    :rtype: pd.DataFrame
+    """
+    url = f"{ISS_URL}/engines/{engine}/markets/{market}/boards/{board}/securities.json"
+    payload = await _get_json(
+        client,
+        url,
+        {
+            "iss.meta": "off",
+            "iss.only": "securities",
+            "securities.columns": "SECID,CURRENCYID",
+        },
+    )
+    df = _block_frame(payload, "securities")
+    return df.rename(columns={"CURRENCYID": "currencyid"})
+
+
+def _prepare_history(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[HISTORY_COLUMNS].copy()
+    df["TRADEDATE"] = pd.to_datetime(df["TRADEDATE"], format="%Y-%m-%d")
+    df[PRICE_COLUMNS] = df[PRICE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    return df
+
+
+async def load_board_history(
+    secids: list[str] = None,
+    date_from: datetime.date = None,
+    date_till: datetime.date = None,
+    engine: str = "stock",
+    market: str = "shares",
+    board: str = "TQBR",
+    max_connections: int = 16,
+    timeout: int = 30,
+) -> pd.DataFrame:
+    """
+    Load daily candles for many securities concurrently, one pooled client for all requests.
+
+    Each security history is paged by ISS, the first page gives the number of pages and the rest
+    are requested concurrently together with the other securities.
+
+    :param secids: Securities to load, defaults to every security on the board.
+    :type secids: list[str], optional
+    :param date_from: First trade date, defaults to the start of the history.
+    :type date_from: datetime.date, optional
+    :param date_till: Last trade date, defaults to the latest one.
+    :type date_till: datetime.date, optional
+    :param engine: ISS engine, defaults to "stock".
+    :type engine: str, optional
+    :param market: ISS market, defaults to "shares".
+    :type market: str, optional
+    :param board: ISS board, defaults to "TQBR".
+    :type board: str, optional
+    :param max_connections: Maximum number of concurrent connections, defaults to 16.
+    :type max_connections: int, optional
+    :param timeout: Maximum wait time for a server response in seconds, defaults to 30.
+    :type timeout: int, optional
+    :return: Candles with TRADEDATE/OPEN/HIGH/LOW/CLOSE/VOLUME/SECID/currencyid columns.
+    :rtype: pd.DataFrame
+    """
+    params = {"history.columns": ",".join(HISTORY_COLUMNS)}
+    if date_from:
+        params["from"] = str(date_from)
+    if date_till:
+        params["till"] = str(date_till)
+    base = f"{ISS_URL}/history/engines/{engine}/markets/{market}/boards/{board}"
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        # Requests wait in the pool queue for as long as it takes
+        timeout=httpx.Timeout(timeout, pool=None),
+    ) as client:
+        securities = await load_board_securities(client, engine, market, board)
+        if secids is not None:
+            securities = securities[securities["SECID"].isin(secids)]
+        frames = await asyncio.gather(
+            *[
+                _get_paged(client, f"{base}/securities/{secid}.json", params, "history")
+                for secid in securities["SECID"]
+            ]
+        )
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_COLUMNS + ["currencyid"])
+    df = _prepare_history(pd.concat(frames, ignore_index=True))
+    return df.merge(securities, on="SECID", how="left")
+
+
+async def load_board_sessions(
+    dates: list,
+    engine: str = "stock",
+    market: str = "shares",
+    board: str = "TQBR",
+    max_connections: int = 16,
+    timeout: int = 30,
+) -> pd.DataFrame:
+    """
+    Load daily candles of every security on a board for the given dates.
+
+    A date needs a couple of requests for the whole board, which makes it the cheap way to top up
+    a few recent sessions.
+
+    :param dates: Trade dates to load.
+    :type dates: list
+    :param engine: ISS engine, defaults to "stock".
+    :type engine: str, optional
+    :param market: ISS market, defaults to "shares".
+    :type market: str, optional
+    :param board: ISS board, defaults to "TQBR".
+    :type board: str, optional
+    :param max_connections: Maximum number of concurrent connections, defaults to 16.
+    :type max_connections: int, optional
+    :param timeout: Maximum wait time for a server response in seconds, defaults to 30.
+    :type timeout: int, optional
+    :return: Candles with TRADEDATE/OPEN/HIGH/LOW/CLOSE/VOLUME/SECID/currencyid columns.
+    :rtype: pd.DataFrame
+    """
+    url = f"{ISS_URL}/history/engines/{engine}/markets/{market}/boards/{board}/securities.json"
+    params = {"history.columns": ",".join(HISTORY_COLUMNS)}
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        # Requests wait in the pool queue for as long as it takes
+        timeout=httpx.Timeout(timeout, pool=None),
+    ) as client:
+        securities = await load_board_securities(client, engine, market, board)
+        frames = await asyncio.gather(
+            *[
+                _get_paged(client, url, dict(params, date=str(date)), "history")
+                for date in pd.DatetimeIndex(dates).date
+            ]
+        )
+    df = _prepare_history(
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=HISTORY_COLUMNS)
+    )
+    return df.merge(securities, on="SECID", how="left")
+
+
+def read_history_store(
+    store_path: str, secids: list[str] = None, columns: list[str] = None
+) -> pd.DataFrame:
+    """
+    Read candles from a history store written by update_history_store.
+
+    :param store_path: Store directory.
+    :type store_path: str
+    :param secids: Securities to read, defaults to all of them.
+    :type secids: list[str], optional
+    :param columns: Columns to read, defaults to all of them.
+    :type columns: list[str], optional
+    :return: Candles sorted by SECID and TRADEDATE.
+    :rtype: pd.DataFrame
+    """
+    filters = None if secids is None else [("SECID", "in", list(secids))]
+    df = pd.read_parquet(store_path, columns=columns, filters=filters)
+    sort_cols = [col for col in ["SECID", "TRADEDATE"] if col in df.columns]
+    return df.sort_values(sort_cols, ignore_index=True)
+
+
+def last_trade_date(store_path: str) -> pd.Timestamp:
+    """
+    Get the latest TRADEDATE in a history store, only that column is read.
+
+    :param store_path: Store directory.
+    :type store_path: str
+    :return: Latest trade date, None for an empty or missing store.
+    :rtype: pd.Timestamp
+    """
+    if not os.path.isdir(store_path) or not any(
+        name.endswith(".parquet") for name in os.listdir(store_path)
+    ):
+        return None
+    dates = pd.read_parquet(store_path, columns=["TRADEDATE"])["TRADEDATE"]
+    return None if dates.empty else dates.max()
+
+
+def update_history_store(
+    store_path: str,
+    date_from: datetime.date = None,
+    date_till: datetime.date = None,
+    **kwargs,
+) -> int:
+    """
+    Refresh a Parquet history store of the whole board.
+
+    An empty store is filled with the full history of every security. Otherwise only the sessions
+    after the last stored TRADEDATE are fetched. New rows are written as one new Parquet part.
+
+    :param store_path: Store directory, created if missing.
+    :type store_path: str
+    :param date_from: First trade date of the initial load, defaults to the start of the history.
+    :type date_from: datetime.date, optional
+    :param date_till: Last trade date to load, defaults to today.
+    :type date_till: datetime.date, optional
+    :param kwargs: engine, market, board, max_connections and timeout, see load_board_history.
+    :return: Number of rows added.
+    :rtype: int
+    """
+    os.makedirs(store_path, exist_ok=True)
+    date_till = pd.Timestamp(date_till or datetime.date.today()).normalize()
+    last_date = last_trade_date(store_path)
+    with profiling.timer("history_fetch"):
+        if last_date is None:
+            df = asyncio.run(
+                load_board_history(
+                    date_from=date_from, date_till=date_till.date(), **kwargs
+                )
+            )
+        else:
+            # Calendar days, MOEX has occasional Saturday sessions; empty days cost one request
+            dates = pd.date_range(last_date + pd.Timedelta(days=1), date_till)
+            if dates.empty:
+                return 0
+            df = asyncio.run(load_board_sessions(dates, **kwargs))
+    if df.empty:
+        return 0
+    first, last = df["TRADEDATE"].min(), df["TRADEDATE"].max()
+    df.to_parquet(
+        os.path.join(store_path, f"part-{first:%Y%m%d}-{last:%Y%m%d}.parquet"),
+        index=False,
+    )
+    profiling.increment("history_rows", len(df))
+    return len(df)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh MOEX daily candles store")
+    parser.add_argument("store_path")
+    parser.add_argument("--board", default="TQBR")
+    parser.add_argument("--from", dest="date_from", default=None)
+    parser.add_argument("--max-connections", type=int, default=16)
+    args = parser.parse_args()
+
+    rows = update_history_store(
+        args.store_path,
+        date_from=args.date_from,
+        board=args.board,
+        max_connections=args.max_connections,
+    )
+    print(f"{rows} rows added to {args.store_path}")
@@ -3,12 +3,15 @@ import re
 import time
 
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+
+from pnd_moex.util.lazy import lazy_import
+
+# selenium is only needed to walk the search pages, bs4 and requests to read news pages
+bs4 = lazy_import("bs4")
+requests = lazy_import("requests")
+webdriver = lazy_import("selenium.webdriver")
+selenium_by = lazy_import("selenium.webdriver.common.by")
+selenium_ui = lazy_import("selenium.webdriver.support.ui")
 
 
 class MOEX_news_scraper:
@@ -17,22 +20,23 @@ class MOEX_news_scraper:
     Easier way to collect data
     """
 
-    def __init__(self, driver: webdriver = webdriver.Firefox, url: str = "") -> None:
+    def __init__(self, driver: callable = None, url: str = "") -> None:
         """initialization
 
-        :param driver: driver like Firefox, Chrome, Edge, etc (full list -> https://selenium-python.readthedocs.io/api.html)
-        :type driver: webdriver
+        :param driver: driver like Firefox, Chrome, Edge, etc (full list -> https://selenium-python.readthedocs.io/api.html),
+        defaults to webdriver.Firefox
+        :type driver: callable, optional
         :param url: url with news search from moex.com.
         I know it's a little too specified class but I need it for now
         :type url: string
         """
-        self.driver = driver()
+        self.driver = (driver or webdriver.Firefox)()
         self.driver.implicitly_wait(10)
         self.driver.get(url)
         time.sleep(10)
         self.current_page_number = 1
         self.base_url = "https://www.moex.com"
-        self.wait = WebDriverWait(self.driver, 10)
+        self.wait = selenium_ui.WebDriverWait(self.driver, 10)
 
     def next_page(self):
         """Clicks and go on to next page
@@ -41,7 +45,9 @@ class MOEX_news_scraper:
         :rtype: _type_
         """
 
-        elems = self.driver.find_elements(By.CLASS_NAME, "searchAdvanced_pagingItem")
+        elems = self.driver.find_elements(
+            selenium_by.By.CLASS_NAME, "searchAdvanced_pagingItem"
+        )
         if len(elems) <= 2:
             return 0
         for idx, elem in enumerate(elems):
@@ -77,7 +83,7 @@ class MOEX_news_scraper:
         """Pull news list from current page"""
 
         html = self.driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
+        soup = bs4.BeautifulSoup(html, "html.parser")
 
         raw_news_list = soup.find_all("div", "searchAdvanced_row")
         news_list = []
@@ -133,9 +139,22 @@ def extract_link_info(
     :return: url, datetime, table info, and body text
     :rtype: dict
     """
-    data = {}
     response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
+    return parse_news_page(response.text, url)
+
+
+def parse_news_page(html: str, url: str = None) -> dict:
+    """parse news page html, split out of extract_link_info so it can be used on saved pages
+
+    :param html: news page html
+    :type html: str
+    :param url: url of the page, defaults to None
+    :type url: str, optional
+    :return: url, datetime, table info, and body text
+    :rtype: dict
+    """
+    data = {}
+    soup = bs4.BeautifulSoup(html, "html.parser")
     html_table = soup.find("table", class_="table1")
     if html_table:
         # some tables broken.
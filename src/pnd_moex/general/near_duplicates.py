@@ -0,0 +1,418 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+_WHITESPACE = re.compile(r"\s+")
+# Multiplier of the polynomial shingle hash
+_SHINGLE_BASE = np.uint64(1_000_003)
+_EMPTY = np.iinfo(np.uint32).max
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase and collapse whitespace, so formatting changes do not change the shingles.
+
+    :param text: Comment text.
+    :type text: str
+    :return: Normalized text.
+    :rtype: str
+    """
+    return _WHITESPACE.sub(" ", str(text).lower()).strip()
+
+
+def _hash_params(num_perm: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Multiply-shift hash family: h(x) = (a * x + b) >> 32 with odd a, for 32-bit x."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(
+        2
+    ) + np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _signature_chunk(args: tuple) -> np.ndarray:
+    """MinHash signatures of a chunk of normalized texts, all shingles hashed at once."""
+    texts, shingle_size, num_perm, seed = args
+    a, b = _hash_params(num_perm, seed)
+    signatures = np.full((len(texts), num_perm), _EMPTY, dtype=np.uint32)
+    # Code points of all texts in one array, a window is a shingle if it stays inside one text
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    docs = np.flatnonzero(lengths >= shingle_size)
+    if not len(docs):
+        return signatures
+    points = np.frombuffer(
+        "".join(texts[i] for i in docs).encode("utf-32-le"), dtype=np.uint32
+    ).astype(np.uint64)
+    n_shingles = lengths[docs] - shingle_size + 1
+    ends = np.cumsum(lengths[docs])
+    starts = np.concatenate([[0], ends[:-1]])
+    positions = np.repeat(starts, n_shingles) + (
+        np.arange(n_shingles.sum())
+        - np.repeat(np.cumsum(n_shingles) - n_shingles, n_shingles)
+    )
+    shingles = np.zeros(len(positions), dtype=np.uint64)
+    for offset in range(shingle_size):
+        shingles = shingles * _SHINGLE_BASE + points[positions + offset]
+    shingles = (shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+
+    segment_starts = np.concatenate([[0], np.cumsum(n_shingles)[:-1]])
+    # Blocks of permutations keep the shingles x permutations matrix small
+    hashed = np.empty((len(shingles), 16), dtype=np.uint64)
+    for lo in range(0, num_perm, 16):
+        block = slice(lo, min(lo + 16, num_perm))
+        out = hashed[:, : block.stop - block.start]
+        np.multiply(shingles[:, None], a[None, block], out=out)
+        out += b[None, block]
+        out >>= np.uint64(32)
+        signatures[docs, block] = np.minimum.reduceat(
+            out.astype(np.uint32), segment_starts, axis=0
+        )
+    return signatures
+
+
+def minhash_signatures(
+    texts: list,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    seed: int = 1,
+    n_jobs: int = None,
+    chunk_size: int = 2_000,
+) -> np.ndarray:
+    """
+    Compute MinHash signatures of character shingles.
+
+    :param texts: Comment texts.
+    :type texts: list
+    :param num_perm: Number of hash functions, defaults to 128.
+    :type num_perm: int, optional
+    :param shingle_size: Shingle length in characters, defaults to 5.
+    :type shingle_size: int, optional
+    :param seed: Seed of the hash functions, signatures are comparable only with the same seed, defaults to 1.
+    :type seed: int, optional
+    :param n_jobs: Number of worker processes, defaults to None (one per CPU). 1 runs in-process.
+    :type n_jobs: int, optional
+    :param chunk_size: Texts per task, defaults to 2_000.
+    :type chunk_size: int, optional
+    :return: Texts x num_perm uint32 array, texts shorter than one shingle get all values at the maximum.
+    :rtype: np.ndarray
+    """
+    texts = [normalize_text(text) for text in texts]
+    tasks = [
+        (texts[lo : lo + chunk_size], shingle_size, num_perm, seed)
+        for lo in range(0, len(texts), chunk_size)
+    ]
+    if not tasks:
+        return np.empty((0, num_perm), dtype=np.uint32)
+    if n_jobs == 1 or len(tasks) == 1:
+        chunks = list(map(_signature_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(_signature_chunk, tasks))
+    return np.concatenate(chunks)
+
+
+def _connected_components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Label every node with the smallest node of its component: min-label propagation with pointer jumping."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        if np.array_equal(labels[u], low) and np.array_equal(labels[v], low):
+            break
+        np.minimum.at(labels, u, low)
+        np.minimum.at(labels, v, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+class NearDuplicateIndex:
+    """
+    Near-duplicate index of forum comments: MinHash signatures with LSH banding.
+
+    Every signature is cut into bands of rows values, and two comments become candidates when
+    any band is equal, which happens with high probability above a Jaccard similarity of about
+    (1 / bands) ** (1 / rows). Candidates are confirmed by the share of equal signature values.
+
+    Signatures, band keys, tokens, days and users are kept in flat arrays, add() appends to them.
+    Grouping is a sort of the band keys, so cluster queries run in n log n for any
+    number of comments instead of comparing pairs.
+
+    A doc id is the position of the comment among all comments passed to add(), so row labels
+    may repeat, as they do across the pages of preprocess_comment_data.
+
+    Example:
+    index = NearDuplicateIndex()
+    index.add(comment_df)  # again for every new batch
+    clusters = index.clusters(min_users=3)
+    comment_df.iloc[clusters["doc_id"]]  # pd.concat(batches, ignore_index=True) for many batches
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        min_length: int = 20,
+        seed: int = 1,
+        tz: str = "Europe/Moscow",
+        token_col: str = "token",
+        datetime_col: str = "comment_datetime",
+        text_col: str = "comment_text",
+        user_col: str = "user_id",
+    ) -> None:
+        """
+        :param num_perm: Number of hash functions, defaults to 128.
+        :type num_perm: int, optional
+        :param bands: Number of LSH bands, must divide num_perm, defaults to 16 (candidates above ~0.7 similarity).
+        :type bands: int, optional
+        :param shingle_size: Shingle length in characters, defaults to 5.
+        :type shingle_size: int, optional
+        :param min_length: Shorter normalized texts ("+1", "thanks") are not indexed, defaults to 20.
+        :type min_length: int, optional
+        :param seed: Seed of the hash functions, defaults to 1.
+        :type seed: int, optional
+        :param tz: Time zone of the days, defaults to "Europe/Moscow".
+        :type tz: str, optional
+        :param token_col: Column name for tokens, defaults to "token".
+        :type token_col: str, optional
+        :param datetime_col: Column name for comment times, defaults to "comment_datetime".
+        :type datetime_col: str, optional
+        :param text_col: Column name for comment texts, defaults to "comment_text".
+        :type text_col: str, optional
+        :param user_col: Column name for user ids, defaults to "user_id".
+        :type user_col: str, optional
+        """
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        self.seed = seed
+        self.tz = tz
+        self.token_col = token_col
+        self.datetime_col = datetime_col
+        self.text_col = text_col
+        self.user_col = user_col
+        self.tokens = []
+        self._token_lookup = {}
+        self._users = pd.Index([])
+        self._band_mix = np.random.default_rng(seed + 1).integers(
+            1, 2**63, size=self.rows, dtype=np.uint64
+        ) * np.uint64(2) + np.uint64(1)
+        self._chunks = []
+        self._arrays = None
+        # Comments passed to add(), indexed or not, the next doc id
+        self.n_seen = 0
+
+    def __len__(self) -> int:
+        return sum(len(chunk["doc_id"]) for chunk in self._chunks)
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(
+            np.uint64
+        )
+        return (bands * self._band_mix).sum(axis=2, dtype=np.uint64)
+
+    def add(self, df: pd.DataFrame, n_jobs: int = None) -> None:
+        """
+        Index a batch of comments.
+
+        :param df: Comments from preprocess_comment_data, doc ids continue from the last batch.
+        :type df: pd.DataFrame
+        :param n_jobs: Number of worker processes for the signatures, defaults to None (one per CPU).
+        :type n_jobs: int, optional
+        """
+        texts = df[self.text_col].fillna("").map(normalize_text).tolist()
+        keep = np.array([len(text) >= self.min_length for text in texts], dtype=bool)
+        doc_ids = self.n_seen + np.flatnonzero(keep)
+        self.n_seen += len(texts)
+        if not keep.any():
+            return
+        df = df[keep]
+        signatures = minhash_signatures(
+            [text for text, k in zip(texts, keep) if k],
+            self.num_perm,
+            self.shingle_size,
+            self.seed,
+            n_jobs,
+        )
+        for token in pd.unique(df[self.token_col]):
+            if token not in self._token_lookup:
+                self._token_lookup[token] = len(self.tokens)
+                self.tokens.append(token)
+        users = df[self.user_col].fillna("").to_numpy()
+        self._users = self._users.append(
+            pd.Index(pd.unique(users)).difference(self._users)
+        )
+
+        times = pd.DatetimeIndex(df[self.datetime_col])
+        if times.tz is not None:
+            times = times.tz_convert(self.tz).tz_localize(None)
+        self._chunks.append(
+            dict(
+                doc_id=doc_ids,
+                token=pd.Index(self.tokens)
+                .get_indexer(df[self.token_col])
+                .astype(np.int32),
+                day=times.normalize().to_numpy().astype("datetime64[D]"),
+                time=times.as_unit("ns").to_numpy(),
+                user=self._users.get_indexer(users).astype(np.int32),
+                signature=signatures,
+                band_key=self._band_keys(signatures),
+            )
+        )
+        self._arrays = None
+
+    def arrays(self) -> dict:
+        """
+        All indexed comments as flat arrays: doc_id, token, day, time, user, signature and band_key.
+
+        :return: Column name -> array.
+        :rtype: dict
+        """
+        if self._arrays is None:
+            if len(self._chunks) > 1:
+                self._chunks = [
+                    {
+                        name: np.concatenate([c[name] for c in self._chunks])
+                        for name in self._chunks[0]
+                    }
+                ]
+            self._arrays = self._chunks[0] if self._chunks else None
+        return self._arrays
+
+    def clusters(
+        self,
+        tokens: list = None,
+        start: str = None,
+        end: str = None,
+        threshold: float = 0.7,
+        min_size: int = 2,
+        min_users: int = 1,
+    ) -> pd.DataFrame:
+        """
+        Find clusters of near-duplicate comments per token per day.
+
+        :param tokens: Tokens to search, defaults to all of them.
+        :type tokens: list, optional
+        :param start: First day, defaults to None.
+        :type start: str, optional
+        :param end: Last day, defaults to None.
+        :type end: str, optional
+        :param threshold: Share of equal signature values to link two comments, defaults to 0.7.
+        :type threshold: float, optional
+        :param min_size: Fewest comments in a cluster, defaults to 2.
+        :type min_size: int, optional
+        :param min_users: Fewest distinct users in a cluster, defaults to 1.
+        :type min_users: int, optional
+        :return: One row per clustered comment: doc_id, token, day, user_id, cluster, cluster_size
+        and cluster_users, sorted by cluster.
+        :rtype: pd.DataFrame
+        """
+        columns = [
+            "doc_id",
+            "token",
+            "day",
+            "user_id",
+            "cluster",
+            "cluster_size",
+            "cluster_users",
+        ]
+        arrays = self.arrays()
+        if arrays is None:
+            return pd.DataFrame(columns=columns)
+        mask = np.ones(len(arrays["doc_id"]), dtype=bool)
+        if tokens is not None:
+            codes = [self._token_lookup[t] for t in tokens if t in self._token_lookup]
+            mask &= np.isin(arrays["token"], codes)
+        if start is not None:
+            mask &= arrays["day"] >= np.datetime64(pd.Timestamp(start).date(), "D")
+        if end is not None:
+            mask &= arrays["day"] <= np.datetime64(pd.Timestamp(end).date(), "D")
+        rows = np.flatnonzero(mask)
+        group = (arrays["token"][rows].astype(np.int64) << 32) | arrays["day"][
+            rows
+        ].astype(np.int64)
+
+        # Star edges: every bucket member is linked to the first member of its (token, day, key) run
+        u, v = [], []
+        positions = np.arange(len(rows))
+        for band in range(self.bands):
+            keys = arrays["band_key"][rows, band]
+            order = np.lexsort((keys, group))
+            is_start = np.ones(len(order), dtype=bool)
+            is_start[1:] = (group[order][1:] != group[order][:-1]) | (
+                keys[order][1:] != keys[order][:-1]
+            )
+            run_start = np.maximum.accumulate(np.where(is_start, positions, 0))
+            members = np.flatnonzero(~is_start)
+            u.append(order[run_start[members]])
+            v.append(order[members])
+        # The same pair is found by several bands, confirm it once
+        pairs = np.unique(
+            np.concatenate(u).astype(np.int64) * len(rows) + np.concatenate(v)
+        )
+        u, v = pairs // len(rows), pairs % len(rows)
+        signatures = arrays["signature"][rows]
+        similar = (signatures[u] == signatures[v]).mean(axis=1) >= threshold
+        labels = _connected_components(len(rows), u[similar], v[similar])
+
+        size = np.bincount(labels, minlength=len(rows))
+        clustered = np.flatnonzero(size[labels] >= min_size)
+        users = arrays["user"][rows]
+        result = pd.DataFrame(
+            dict(
+                doc_id=arrays["doc_id"][rows[clustered]],
+                token=np.array(self.tokens, dtype=object)[
+                    arrays["token"][rows[clustered]]
+                ],
+                day=arrays["day"][rows[clustered]].astype("datetime64[ns]"),
+                user_id=self._users.to_numpy()[users[clustered]],
+                cluster=labels[clustered],
+                cluster_size=size[labels[clustered]],
+            )
+        )
+        result["cluster_users"] = result.groupby("cluster")["user_id"].transform(
+            "nunique"
+        )
+        result = result[result["cluster_users"] >= min_users]
+        # Cluster ids are the positions of their first comment, renumber them 0..n-1
+        result["cluster"] = pd.factorize(result["cluster"], sort=True)[0]
+        return result.sort_values(["cluster", "doc_id"], ignore_index=True)[columns]
+
+    def query(self, text: str, threshold: float = 0.7) -> pd.DataFrame:
+        """
+        Find indexed comments similar to a text, over all tokens and days.
+
+        :param text: Text to look up.
+        :type text: str
+        :param threshold: Share of equal signature values, defaults to 0.7.
+        :type threshold: float, optional
+        :return: doc_id, token, time and similarity of the matches, most similar first.
+        :rtype: pd.DataFrame
+        """
+        arrays = self.arrays()
+        signature = minhash_signatures(
+            [text], self.num_perm, self.shingle_size, self.seed, n_jobs=1
+        )
+        if arrays is None:
+            return pd.DataFrame(columns=["doc_id", "token", "time", "similarity"])
+        keys = self._band_keys(signature)[0]
+        candidates = np.flatnonzero((arrays["band_key"] == keys).any(axis=1))
+        similarity = (arrays["signature"][candidates] == signature).mean(axis=1)
+        found = candidates[similarity >= threshold]
+        return pd.DataFrame(
+            dict(
+                doc_id=arrays["doc_id"][found],
+                token=np.array(self.tokens, dtype=object)[arrays["token"][found]],
+                time=arrays["time"][found],
+                similarity=similarity[similarity >= threshold],
+            )
+        ).sort_values("similarity", ascending=False, ignore_index=True)
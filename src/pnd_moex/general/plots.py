@@ -1,11 +1,13 @@
 import itertools
 
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
+from pnd_moex.util.lazy import lazy_import
 from pnd_moex.util.other import find_all_sequences
 
+go = lazy_import("plotly.graph_objects")
+subplots = lazy_import("plotly.subplots")
+
 
 def visual_args(period: tuple, color: str, ymax: float) -> dict:
     """
@@ -129,7 +131,9 @@ def anomaly_plot(
     :type volume_col: str, optional
     """
     # Creating figure
-    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.02)
+    fig = subplots.make_subplots(
+        rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.02
+    )
     # Plotting candlesticks
     fig.add_trace(
         go.Candlestick(
@@ -259,7 +263,7 @@ def pnd_sample_data_plot(
     :type token_column: str, optional
     """
     sample_df = pump_and_dump_df.sample(sample_size)
-    fig = make_subplots(
+    fig = subplots.make_subplots(
         rows=sample_size,
         cols=1,
         subplot_titles=tuple(
@@ -0,0 +1,278 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ("OPEN", "HIGH", "LOW", "CLOSE", "VOLUME")
+
+_HEADER_FILE = "header.json"
+_VERSION = 1
+_DTYPE = np.float32
+
+
+class PriceMatrix:
+    """
+    On-disk price matrix: one raw float32 file per field with a sessions x securities layout,
+    plus a JSON header with the SECID and date axes.
+
+    Files are opened with np.memmap, so any number of processes can read the same matrix without
+    copying or unpickling it. Rows are sessions, which makes adding a day an append to each file.
+    Columns are allocated with spare capacity, so new listings usually fit without a rewrite.
+
+    Example:
+    matrix = PriceMatrix.build(read_history_store("datasets/history"), "datasets/matrix")
+    matrix.append_sessions(new_candles)  # nightly
+    close = PriceMatrix.open("datasets/matrix").field("CLOSE")  # in workers
+    """
+
+    def __init__(self, path: str, header: dict, mode: str = "r") -> None:
+        """
+        Open the field files described by a header. Use build() or open() instead.
+
+        :param path: Matrix directory.
+        :type path: str
+        :param header: Parsed header.json.
+        :type header: dict
+        :param mode: np.memmap mode, "r" for readers and "r+" for writers, defaults to "r".
+        :type mode: str, optional
+        """
+        self.path = path
+        self.mode = mode
+        self._load(header)
+
+    def _load(self, header: dict) -> None:
+        self.header = header
+        self.secids = pd.Index(header["secids"])
+        self.dates = pd.DatetimeIndex(
+            np.array(header["dates"], dtype="datetime64[D]")
+        ).astype("datetime64[ns]")
+        self._arrays = {field: self._map(field) for field in header["fields"]}
+
+    @property
+    def fields(self) -> list:
+        return self.header["fields"]
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.dates), len(self.secids)
+
+    def _file(self, field: str) -> str:
+        return _field_file(self.path, field, self.header.get("generation", 0))
+
+    def _map(self, field: str) -> np.ndarray:
+        shape = (len(self.header["dates"]), self.header["capacity"])
+        if shape[0] == 0:
+            return np.empty(shape, dtype=_DTYPE)
+        return np.memmap(self._file(field), dtype=_DTYPE, mode=self.mode, shape=shape)
+
+    def field(self, field: str) -> np.ndarray:
+        """
+        Get a zero-copy sessions x securities view of one field.
+
+        :param field: Field name, e.g. "CLOSE".
+        :type field: str
+        :return: Memory-mapped float32 array, NaN where a security did not trade.
+        :rtype: np.ndarray
+        """
+        return self._arrays[field][:, : len(self.secids)]
+
+    def frame(self, field: str) -> pd.DataFrame:
+        """
+        Get one field as a DataFrame with dates as the index and SECIDs as columns.
+
+        :param field: Field name, e.g. "CLOSE".
+        :type field: str
+        :return: Wide DataFrame.
+        :rtype: pd.DataFrame
+        """
+        return pd.DataFrame(
+            self.field(field), index=self.dates, columns=self.secids, copy=False
+        )
+
+    def security_frame(self, secid: str, date_col: str = "TRADEDATE") -> pd.DataFrame:
+        """
+        Get the candles of one security in the layout of the history data,
+        ready for anomaly_detect, anomaly_news_markup_func and anomaly_plot.
+
+        :param secid: Security id.
+        :type secid: str
+        :param date_col: Name of the date index, defaults to "TRADEDATE".
+        :type date_col: str, optional
+        :return: DataFrame indexed by date with one column per field, sessions without trades dropped.
+        :rtype: pd.DataFrame
+        """
+        col = self.secids.get_loc(secid)
+        df = pd.DataFrame(
+            {
+                field: self._arrays[field][:, col].astype(np.float64)
+                for field in self.fields
+            },
+            index=self.dates.rename(date_col),
+        )
+        df["SECID"] = secid
+        return df.dropna(how="all", subset=self.fields)
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r") -> "PriceMatrix":
+        """
+        Open an existing matrix.
+
+        :param path: Matrix directory.
+        :type path: str
+        :param mode: np.memmap mode, "r" for readers and "r+" for writers, defaults to "r".
+        :type mode: str, optional
+        :return: Price matrix.
+        :rtype: PriceMatrix
+        """
+        with open(os.path.join(path, _HEADER_FILE), encoding="UTF-8") as file:
+            header = json.load(file)
+        if header["version"] != _VERSION:
+            raise ValueError(f"Unsupported price matrix version: {header['version']}")
+        return cls(path, header, mode)
+
+    @classmethod
+    def build(
+        cls,
+        df: pd.DataFrame,
+        path: str,
+        fields: tuple = FIELDS,
+        date_col: str = "TRADEDATE",
+        secid_col: str = "SECID",
+        spare_capacity: float = 0.25,
+    ) -> "PriceMatrix":
+        """
+        Write a new matrix from candles in the long history layout, replacing an existing one.
+
+        :param df: Candles with date, SECID and field columns.
+        :type df: pd.DataFrame
+        :param path: Matrix directory, created if missing.
+        :type path: str
+        :param fields: Fields to store, defaults to FIELDS.
+        :type fields: tuple, optional
+        :param date_col: Name of the date column, defaults to "TRADEDATE".
+        :type date_col: str, optional
+        :param secid_col: Name of the security column, defaults to "SECID".
+        :type secid_col: str, optional
+        :param spare_capacity: Share of extra columns reserved for new securities, defaults to 0.25.
+        :type spare_capacity: float, optional
+        :return: Price matrix opened for reading.
+        :rtype: PriceMatrix
+        """
+        os.makedirs(path, exist_ok=True)
+        dates = pd.DatetimeIndex(pd.to_datetime(df[date_col]).unique()).sort_values()
+        secids = pd.Index(df[secid_col].unique()).sort_values()
+        capacity = max(1, int(len(secids) * (1 + spare_capacity)))
+        rows = dates.get_indexer(pd.to_datetime(df[date_col]))
+        cols = secids.get_indexer(df[secid_col])
+        for field in fields:
+            values = np.full((len(dates), capacity), np.nan, dtype=_DTYPE)
+            values[rows, cols] = df[field].to_numpy(dtype=_DTYPE)
+            _write_atomic(_field_file(path, field, 0), values)
+        header = dict(
+            version=_VERSION,
+            fields=list(fields),
+            generation=0,
+            capacity=capacity,
+            secids=secids.tolist(),
+            dates=dates.strftime("%Y-%m-%d").tolist(),
+        )
+        _write_header(path, header)
+        return cls.open(path)
+
+    def append_sessions(
+        self,
+        df: pd.DataFrame,
+        date_col: str = "TRADEDATE",
+        secid_col: str = "SECID",
+    ) -> int:
+        """
+        Append sessions newer than the last stored date. Only the new rows are written,
+        unless new securities overflow the spare column capacity, which rewrites the files once
+        under new names.
+
+        :param df: Candles in the long history layout, rows for already stored dates are ignored.
+        :type df: pd.DataFrame
+        :param date_col: Name of the date column, defaults to "TRADEDATE".
+        :type date_col: str, optional
+        :param secid_col: Name of the security column, defaults to "SECID".
+        :type secid_col: str, optional
+        :return: Number of appended sessions.
+        :rtype: int
+        """
+        df_dates = pd.to_datetime(df[date_col])
+        if len(self.dates):
+            mask = df_dates > self.dates[-1]
+            df, df_dates = df[mask], df_dates[mask]
+        if df.empty:
+            return 0
+        new_dates = pd.DatetimeIndex(df_dates.unique()).sort_values()
+        new_secids = pd.Index(df[secid_col].unique()).difference(self.secids)
+        secids = self.secids.append(new_secids)
+        capacity = self.header["capacity"]
+        if len(secids) > capacity:
+            capacity = self._grow(int(len(secids) * 1.25))
+
+        rows = new_dates.get_indexer(df_dates)
+        cols = secids.get_indexer(df[secid_col])
+        # Rows start where the header says the data ends: bytes left by an interrupted append
+        # (written, but the header not replaced) are overwritten
+        offset = len(self.header["dates"]) * capacity * np.dtype(_DTYPE).itemsize
+        for field in self.fields:
+            values = np.full((len(new_dates), capacity), np.nan, dtype=_DTYPE)
+            values[rows, cols] = df[field].to_numpy(dtype=_DTYPE)
+            file_path = self._file(field)
+            with open(
+                file_path, mode="r+b" if os.path.exists(file_path) else "wb"
+            ) as file:
+                file.seek(offset)
+                file.truncate()
+                values.tofile(file)
+
+        # Data first, header last: readers never see dates without rows
+        header = dict(self.header, capacity=capacity, secids=secids.tolist())
+        header["dates"] = self.header["dates"] + new_dates.strftime("%Y-%m-%d").tolist()
+        _write_header(self.path, header)
+        self._load(header)
+        return len(new_dates)
+
+    def _grow(self, capacity: int) -> int:
+        # The wider files get new names and the header switches to them in one replace, so
+        # readers and a crash before the header is written still see the old layout intact
+        n_sessions = len(self.header["dates"])
+        old_files = [self._file(field) for field in self.fields]
+        generation = self.header.get("generation", 0) + 1
+        for field in self.fields:
+            values = np.full((n_sessions, capacity), np.nan, dtype=_DTYPE)
+            values[:, : self.header["capacity"]] = self._arrays[field]
+            _write_atomic(_field_file(self.path, field, generation), values)
+        header = dict(self.header, capacity=capacity, generation=generation)
+        _write_header(self.path, header)
+        self._load(header)
+        for file_path in old_files:
+            try:
+                os.remove(file_path)
+            except OSError:
+                # Missing, or still mapped by a reader on a platform that does not allow it
+                pass
+        return capacity
+
+
+def _field_file(path: str, field: str, generation: int) -> str:
+    """File of a field, every capacity growth writes a new generation."""
+    if generation == 0:
+        return os.path.join(path, f"{field}.f32")
+    return os.path.join(path, f"{field}.{generation}.f32")
+
+
+def _write_atomic(file_path: str, values: np.ndarray) -> None:
+    tmp_path = file_path + ".tmp"
+    values.tofile(tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def _write_header(path: str, header: dict) -> None:
+    tmp_path = os.path.join(path, _HEADER_FILE + ".tmp")
+    with open(tmp_path, mode="w", encoding="UTF-8") as file:
+        json.dump(header, file)
+    os.replace(tmp_path, os.path.join(path, _HEADER_FILE))
@@ -0,0 +1,214 @@
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+FIELDS = ("OPEN", "HIGH", "LOW", "CLOSE", "VOLUME")
+
+
+def sliding_windows(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Strided view of every window of consecutive rows, no data is copied.
+
+    :param values: Sessions x fields array.
+    :type values: np.ndarray
+    :param window: Window length in sessions.
+    :type window: int
+    :return: Read-only view, window start x session in window x field.
+    :rtype: np.ndarray
+    """
+    # sliding_window_view puts the window axis last, swapping axes keeps it a view
+    return sliding_window_view(values, window, axis=0).swapaxes(1, 2)
+
+
+def _window_sums(flags: np.ndarray, window: int) -> np.ndarray:
+    """Number of set flags in every window, from one prefix sum."""
+    counts = np.concatenate([[0], np.cumsum(flags, dtype=np.int64)])
+    return counts[window:] - counts[:-window]
+
+
+def valid_window_starts(
+    marks: np.ndarray,
+    window: int,
+    na_mark: any = -1,
+    values: np.ndarray = None,
+    segments: np.ndarray = None,
+) -> np.ndarray:
+    """
+    Find windows that do not touch na_mark sessions.
+
+    :param marks: Marks from anomaly_news_markup_func, one per session.
+    :type marks: np.ndarray
+    :param window: Window length in sessions.
+    :type window: int
+    :param na_mark: Mark of excluded sessions, defaults to -1.
+    :type na_mark: any, optional
+    :param values: Sessions x fields array, windows with NaN are excluded too, defaults to None.
+    :type values: np.ndarray, optional
+    :param segments: Segment ids (new_index), windows crossing a segment border are excluded, defaults to None.
+    :type segments: np.ndarray, optional
+    :return: Start positions of the valid windows.
+    :rtype: np.ndarray
+    """
+    marks = np.asarray(marks)
+    if len(marks) < window:
+        return np.empty(0, dtype=np.int64)
+    bad = marks == na_mark
+    if values is not None:
+        bad |= np.isnan(values).any(axis=1)
+    valid = _window_sums(bad, window) == 0
+    if segments is not None and window > 1:
+        # Segments are contiguous runs, a window inside one segment crosses no border
+        segments = np.asarray(segments, dtype=np.float64)
+        border = segments[1:] != segments[:-1]
+        valid &= _window_sums(border, window - 1) == 0
+    return np.flatnonzero(valid)
+
+
+class WindowSampler:
+    """
+    Fixed-length (window, label) training samples from marked data of many securities.
+
+    Every security keeps one sessions x fields array, windows are strided views over it, and
+    samples are addressed by (security, window start) pairs. Shuffling permutes these pairs,
+    only the windows of the current batch are gathered into a new array.
+
+    A window is labelled with the mark of its last session: 1 when it ends in a marked
+    pump period, 0 otherwise. Windows touching na_mark sessions are skipped.
+
+    Example:
+    marked = {token: anomaly_news_markup_func(df, anomaly_map, news) for ...}
+    sampler = WindowSampler(marked, window=20)
+    for x, y in sampler.batches(256, seed=0):
+        ...  # x: batch x 20 x 5, y: batch
+    """
+
+    def __init__(
+        self,
+        frames: dict,
+        window: int = 20,
+        fields: tuple = FIELDS,
+        mark_col: str = "mark",
+        na_mark: any = -1,
+        segment_col: str = None,
+        dtype: np.dtype = np.float32,
+    ) -> None:
+        """
+        :param frames: Token -> output of anomaly_news_markup_func.
+        :type frames: dict
+        :param window: Window length in sessions, defaults to 20.
+        :type window: int, optional
+        :param fields: Feature columns, defaults to FIELDS.
+        :type fields: tuple, optional
+        :param mark_col: Mark column, defaults to "mark".
+        :type mark_col: str, optional
+        :param na_mark: Mark of excluded sessions, defaults to -1.
+        :type na_mark: any, optional
+        :param segment_col: Segment column (new_index) to keep every window inside one segment, defaults to None.
+        :type segment_col: str, optional
+        :param dtype: Dtype of the feature arrays, defaults to np.float32.
+        :type dtype: np.dtype, optional
+        """
+        self.window = window
+        self.fields = tuple(fields)
+        self.tokens = []
+        self._values = []
+        self._views = []
+        self._dates = []
+        tokens, starts, labels = [], [], []
+        for token, df in frames.items():
+            values = np.ascontiguousarray(df[list(self.fields)].to_numpy(dtype=dtype))
+            marks = df[mark_col].to_numpy()
+            segments = None if segment_col is None else df[segment_col].to_numpy()
+            token_starts = valid_window_starts(marks, window, na_mark, values, segments)
+            if not len(token_starts):
+                continue
+            tokens.append(np.full(len(token_starts), len(self.tokens), dtype=np.int32))
+            starts.append(token_starts)
+            labels.append((marks[token_starts + window - 1] == 1).astype(np.int8))
+            self.tokens.append(token)
+            self._values.append(values)
+            self._views.append(sliding_windows(values, window))
+            self._dates.append(df.index)
+        self._token_ids = np.concatenate(tokens) if tokens else np.empty(0, np.int32)
+        self._starts = np.concatenate(starts) if starts else np.empty(0, np.int64)
+        self.labels = np.concatenate(labels) if labels else np.empty(0, np.int8)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def window_view(self, i: int) -> np.ndarray:
+        """
+        Get one sample without copying.
+
+        :param i: Sample number.
+        :type i: int
+        :return: Read-only session x field view.
+        :rtype: np.ndarray
+        """
+        return self._views[self._token_ids[i]][self._starts[i]]
+
+    def index_frame(self) -> pd.DataFrame:
+        """
+        Describe every sample: token, first and last session and label.
+
+        :return: DataFrame aligned with the sample numbers.
+        :rtype: pd.DataFrame
+        """
+        start = np.empty(len(self), dtype="datetime64[ns]")
+        end = np.empty(len(self), dtype="datetime64[ns]")
+        for t, dates in enumerate(self._dates):
+            mask = self._token_ids == t
+            dates = pd.DatetimeIndex(dates).as_unit("ns").to_numpy()
+            start[mask] = dates[self._starts[mask]]
+            end[mask] = dates[self._starts[mask] + self.window - 1]
+        return pd.DataFrame(
+            dict(
+                token=np.array(self.tokens, dtype=object)[self._token_ids],
+                start=start,
+                end=end,
+                label=self.labels,
+            )
+        )
+
+    def _gather(self, samples: np.ndarray) -> np.ndarray:
+        token_ids = self._token_ids[samples]
+        starts = self._starts[samples]
+        out = np.empty(
+            (len(samples), self.window, len(self.fields)),
+            dtype=self._values[0].dtype if self._values else np.float32,
+        )
+        for t in np.unique(token_ids):
+            mask = token_ids == t
+            out[mask] = self._views[t][starts[mask]]
+        return out
+
+    def batches(
+        self,
+        batch_size: int = 256,
+        shuffle: bool = True,
+        seed: int = None,
+        drop_last: bool = False,
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Stream (windows, labels) batches, windows of different tokens are mixed when shuffled.
+
+        :param batch_size: Samples per batch, defaults to 256.
+        :type batch_size: int, optional
+        :param shuffle: Visit samples in random order, defaults to True.
+        :type shuffle: bool, optional
+        :param seed: Random seed of the shuffle, defaults to None.
+        :type seed: int, optional
+        :param drop_last: Skip the last incomplete batch, defaults to False.
+        :type drop_last: bool, optional
+        :return: Iterator of batch x session x field arrays and batch labels.
+        :rtype: Iterator[tuple[np.ndarray, np.ndarray]]
+        """
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        for lo in range(0, stop, batch_size):
+            samples = order[lo : lo + batch_size]
+            yield self._gather(samples), self.labels[samples]
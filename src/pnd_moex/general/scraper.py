@@ -1,14 +1,28 @@
+from __future__ import annotations
+
 import asyncio
+import re
+import warnings
 from urllib.parse import urljoin
 
-import arrow
-import bs4
-import httpx
-import re
 import pandas as pd
-from fuzzywuzzy import fuzz
-from isswrapper.loaders.securities import security_description
-from isswrapper.util.async_helpers import fetch_all
+
+from pnd_moex.util import profiling
+from pnd_moex.util.fetch import FetchScheduler
+from pnd_moex.util.lazy import lazy_import
+
+# Network and parsing backends are imported on first use
+bs4 = lazy_import("bs4")
+httpx = lazy_import("httpx")
+fuzz = lazy_import("fuzzywuzzy.fuzz")
+securities = lazy_import("isswrapper.loaders.securities")
+
+# Comment timestamps are kept as raw strings by the extractors and parsed column-wise
+# by normalize_comment_datetimes. SmartLab gives ISO 8601 with an UTC offset,
+# MFD gives Moscow wall time without an offset.
+MOSCOW_TZ = "Europe/Moscow"
+SMARTLAB_DATETIME_FORMAT = "ISO8601"
+MFD_DATETIME_FORMAT = "%d.%m.%Y %H:%M"
 
 
 def get_security_names(token: str) -> tuple:
@@ -20,7 +34,7 @@ def get_security_names(token: str) -> tuple:
     :return: A tuple containing the short and full names of the security.
     :rtype: tuple
     """
-    s_df = security_description(q=token)
+    s_df = securities.security_description(q=token)
     s_df.set_index("name", inplace=True)
     return s_df.loc["SHORTNAME", "value"], s_df.loc["NAME", "value"]
 
@@ -112,6 +126,8 @@ def extract_smartlab_comment_data(comment: bs4.element.Tag) -> dict:
     """
     Extract valuable data from a comment and package it into a dictionary.
 
+    comment_datetime is left as the raw ISO 8601 string, see normalize_comment_datetimes.
+
     :param comment: The comment element.
     :type comment: bs4.element.Tag
     :return: Extracted data as a dictionary.
@@ -123,7 +139,7 @@ def extract_smartlab_comment_data(comment: bs4.element.Tag) -> dict:
         comment_score=int(
             comment_body.find("a", class_="cm_mrk").text.replace(" ", "")
         ),
-        comment_datetime=arrow.get(comment_body.find("time").get("datetime")).datetime,
+        comment_datetime=comment_body.find("time").get("datetime"),
         user_id=comment_body.find("a", class_="a_name trader_other")
         .get("href")
         .split("/")[2],
@@ -134,6 +150,9 @@ def extract_smartlab_comment_data(comment: bs4.element.Tag) -> dict:
 def extract_mfd_comment_data(comment: bs4.element.Tag) -> dict:
     """
     Extract valuable data from a comment and package it into a dictionary.
+
+    comment_datetime is left as the raw "DD.MM.YYYY HH:mm" Moscow time string, see normalize_comment_datetimes.
+
     :param comment: The comment element.
     :type comment: bs4.element.Tag
     :return: Extracted data as a dictionary.
@@ -149,9 +168,7 @@ def extract_mfd_comment_data(comment: bs4.element.Tag) -> dict:
     return dict(
         comment_text=None if comment_text is None else comment_text.text,
         comment_score=0 if comment_score is None else int(comment_score.text),
-        comment_datetime=arrow.get(
-            comment.find("a", class_="mfd-post-link").text, "DD.MM.YYYY HH:mm"
-        ).datetime,
+        comment_datetime=comment.find("a", class_="mfd-post-link").text.strip(),
         comment_misc=None if comment_misc is None else comment_misc.text,
         user_id=None if user_id is None else user_id.get("href"),
         user_score=None
@@ -166,18 +183,25 @@ def get_smartlab_forum_data(
     max_connections: int = 8,
     max_keepalive_connections: int = 4,
     alt_names: any = None,
+    scheduler: FetchScheduler = None,
 ) -> pd.DataFrame:
     """
     Fetch all comment data for the given list of tokens asynchronously.
 
+    Pages go through a FetchScheduler work queue, which adapts the concurrency to the server
+    and retries throttled and failed requests. Pages that still fail are left out.
+
     :param tokens: List of token names to fetch forum data for.
     :type tokens: List[str]
-    :param chunk_size: Number of URLs to process in each batch, defaults to 200.
+    :param chunk_size: Ignored, kept for compatibility: URLs are no longer fetched in batches.
     :type chunk_size: int, optional
     :param max_connections: Maximum number of concurrent connections, defaults to 8.
     :type max_connections: int, optional
-    :param max_keepalive_connections: Maximum number of keep-alive connections, defaults to 4.
+    :param max_keepalive_connections: Ignored, kept for compatibility: every pooled connection is kept alive.
     :type max_keepalive_connections: int, optional
+    :param scheduler: Scheduler to fetch with, e.g. to reuse its learned limits or read its stats(),
+    defaults to a new one with max_connections as the highest concurrency.
+    :type scheduler: FetchScheduler, optional
     :return: DataFrame with all forum pages for all tokens.
     :rtype: pd.DataFrame
     """
@@ -215,21 +239,24 @@ def get_smartlab_forum_data(
     # Unite all tokens into one DataFrame
     final_df = pd.concat(raw_url_df_list)
     links = final_df["url"].unique().tolist()
-    # Fetch all urls
-    responses = asyncio.run(
-        fetch_all(
-            links,
-            chunk_size=chunk_size,
-            max_connections=max_connections,
-            max_keepalive_connections=max_keepalive_connections,
+    if scheduler is None:
+        scheduler = FetchScheduler(
+            initial_concurrency=min(4, max_connections), max_concurrency=max_connections
         )
-    )
+    # Fetch all urls
+    with profiling.timer("fetch"):
+        responses = asyncio.run(scheduler.fetch_all(links))
+    responses = [r for r in responses if r is not None and r.is_success]
+    if profiling.is_enabled():
+        profiling.increment("pages_fetched", len(responses))
+        profiling.increment("bytes_fetched", sum(len(r.content) for r in responses))
     tmp_df = pd.DataFrame(responses, columns=["body"])
     tmp_df["url"] = tmp_df["body"].apply(lambda x: str(x.url))
     # merge every page back
     return final_df.merge(tmp_df, on="url", how="inner")
 
 
+@profiling.timed("parse")
 def extract_comments_from_page(
     page: httpx.Response,
     comment_dict: dict = dict(name="li", attrs={"data-type": "comment"}),
@@ -246,14 +273,67 @@ def extract_comments_from_page(
     soup = bs4.BeautifulSoup(page.text, "html.parser")
     comment_objs = soup.find_all(**comment_dict)
     comment_list = [comment_extraction_func(obj) for obj in comment_objs]
+    profiling.increment("comments_parsed", len(comment_list))
     return pd.DataFrame(comment_list)
 
 
+def normalize_comment_datetimes(
+    comment_df: pd.DataFrame,
+    datetime_col: str = "comment_datetime",
+    datetime_format: str = SMARTLAB_DATETIME_FORMAT,
+    source_tz: str = None,
+    tz: str = MOSCOW_TZ,
+) -> pd.DataFrame:
+    """
+    Parse the raw comment timestamp strings of a whole column at once.
+
+    Replaces per-comment parsing: the column is converted with a single pd.to_datetime call
+    into a tz-aware datetime64 column. Strings that do not match the format become NaT, with a
+    warning and the "datetimes_unparsed" profiling counter.
+
+    :param comment_df: Comment data with raw timestamp strings.
+    :type comment_df: pd.DataFrame
+    :param datetime_col: Column name for timestamps, defaults to "comment_datetime".
+    :type datetime_col: str, optional
+    :param datetime_format: Format of the strings, SMARTLAB_DATETIME_FORMAT ("ISO8601") or MFD_DATETIME_FORMAT, defaults to SMARTLAB_DATETIME_FORMAT.
+    :type datetime_format: str, optional
+    :param source_tz: Time zone of strings without an UTC offset, e.g. MOSCOW_TZ for MFD.
+    If None, the strings are expected to carry their own offset. Defaults to None.
+    :type source_tz: str, optional
+    :param tz: Time zone of the resulting column, defaults to MOSCOW_TZ.
+    :type tz: str, optional
+    :return: The same DataFrame with the parsed column.
+    :rtype: pd.DataFrame
+    """
+    raw = comment_df[datetime_col]
+    if source_tz is None:
+        # Offsets may differ between rows, so go through UTC
+        parsed = pd.to_datetime(raw, format=datetime_format, utc=True, errors="coerce")
+        comment_df[datetime_col] = parsed.dt.tz_convert(tz)
+    else:
+        # Wall time: DST transitions before 2011 give ambiguous or missing local times
+        parsed = pd.to_datetime(raw, format=datetime_format, errors="coerce")
+        comment_df[datetime_col] = parsed.dt.tz_localize(
+            source_tz, ambiguous="NaT", nonexistent="shift_forward"
+        ).dt.tz_convert(tz)
+    # Malformed strings become NaT instead of stopping the whole batch, but are reported
+    unparsed = int((parsed.isna() & raw.notna()).sum())
+    if unparsed:
+        profiling.increment("datetimes_unparsed", unparsed)
+        warnings.warn(
+            f"{unparsed} of {len(raw)} {datetime_col} values could not be parsed "
+            f"with format {datetime_format!r} and were set to NaT"
+        )
+    return comment_df
+
+
 def preprocess_comment_data(
     response_df: pd.DataFrame,
     token_col: str = "token",
     url_col: str = "url",
     response_col: str = "body",
+    datetime_format: str = SMARTLAB_DATETIME_FORMAT,
+    source_tz: str = None,
 ) -> pd.DataFrame:
     """
     Preprocess comment data obtained from smartlab forum responses.
@@ -266,6 +346,10 @@ def preprocess_comment_data(
     :type url_col: str, optional
     :param response_col: Column name for responses, defaults to "body".
     :type response_col: str, optional
+    :param datetime_format: Format of the comment timestamps, see normalize_comment_datetimes, defaults to SMARTLAB_DATETIME_FORMAT.
+    :type datetime_format: str, optional
+    :param source_tz: Time zone of timestamps without an UTC offset, see normalize_comment_datetimes, defaults to None.
+    :type source_tz: str, optional
     :return: Processed data from all the provided responses from the forum.
     :rtype: pd.DataFrame
     """
@@ -275,12 +359,15 @@ def preprocess_comment_data(
         page_df[token_col] = row[token_col]
         page_df[url_col] = row[url_col]
         processed_dfs.append(page_df)
-    return pd.concat(processed_dfs)
+    comment_df = pd.concat(processed_dfs)
+    with profiling.timer("normalize_datetimes"):
+        return normalize_comment_datetimes(
+            comment_df, datetime_format=datetime_format, source_tz=source_tz
+        )
 
 
 if __name__ == "__main__":
     import os
-    import time
 
     # current_path = os.getcwd()
     # datasets_folder_path = os.path.join(current_path, "datasets")
@@ -290,11 +377,12 @@ if __name__ == "__main__":
     # tokens = pnd_token_date_df["token"].unique().tolist()
 
     # print("execution started")
-    # start_time = time.time()
+    # profiling.enable()
 
     # df = get_smartlab_forum_data(tokens)
     # f_df = preprocess_comment_data(df)
     # f_df.to_parquet(os.path.join(datasets_folder_path, "smartlab_forum_data.parquet"))
 
-    # print(f"time consumed {time.time() - start_time} seconds")
+    # profiling.export(os.path.join(datasets_folder_path, "scraper_profile.json"))
+    # print(profiling.snapshot()["timers"])
     # print(f_df.head())
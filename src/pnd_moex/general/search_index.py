@@ -0,0 +1,485 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+_WORD = re.compile(r"[0-9a-zа-я]+")
+# Moscow wall-clock format of news_date on MOEX news pages
+NEWS_DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+_DELTA_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+def words(text: str) -> list:
+    """
+    Split text into normalized words: lowercase, "ё" as "е", letters and digits only.
+
+    :param text: Any text.
+    :type text: str
+    :return: Words in text order.
+    :rtype: list
+    """
+    return _WORD.findall(str(text).lower().replace("ё", "е"))
+
+
+def text_terms(text: str) -> set:
+    """
+    Index terms of a text: every word and every pair of adjacent words.
+
+    Tickers and ISINs are single words, "ПАО Тестовая компания" is found through its word pairs.
+
+    :param text: Any text.
+    :type text: str
+    :return: Unique terms, pairs joined with a space.
+    :rtype: set
+    """
+    text_words = words(text)
+    return set(text_words) | {f"{a} {b}" for a, b in zip(text_words, text_words[1:])}
+
+
+def _chunk_terms(texts: list) -> list:
+    return [text_terms(text) for text in texts]
+
+
+def security_queries(token: str, isin: str = None, names: tuple = ()) -> list:
+    """
+    Queries matching mentions of a security: its ticker, ISIN and names.
+
+    For example, security_queries("SBER", "RU0009029540", get_security_names("SBER")).
+
+    :param token: Ticker.
+    :type token: str
+    :param isin: ISIN, defaults to None.
+    :type isin: str, optional
+    :param names: Short and full names, e.g. from get_security_names, defaults to ().
+    :type names: tuple, optional
+    :return: One list of terms per query, a query matches documents holding all of its terms.
+    :rtype: list
+    """
+    queries = []
+    for phrase in [token, isin, *names]:
+        if not phrase:
+            continue
+        phrase_words = words(phrase)
+        if len(phrase_words) == 1:
+            queries.append(phrase_words)
+        elif phrase_words:
+            queries.append([f"{a} {b}" for a, b in zip(phrase_words, phrase_words[1:])])
+    return queries
+
+
+def encode_segment(term_ids: np.ndarray, doc_ids: np.ndarray) -> dict:
+    """
+    Delta-encode the posting lists of a batch, each list with the narrowest unsigned dtype
+    that fits its largest gap.
+
+    :param term_ids: Term ids of the postings, sorted.
+    :type term_ids: np.ndarray
+    :param doc_ids: Doc ids of the postings, increasing within every term.
+    :type doc_ids: np.ndarray
+    :return: Segment: sorted term ids with first doc id, length, width and offset of their lists,
+    and one gap array per dtype.
+    :rtype: dict
+    """
+    is_start = np.ones(len(term_ids), dtype=bool)
+    is_start[1:] = term_ids[1:] != term_ids[:-1]
+    starts = np.flatnonzero(is_start)
+    n_terms = len(starts)
+    lengths = np.diff(np.append(starts, len(term_ids)))
+    # Gaps inside one posting list, the first doc id of every list is kept apart
+    inside = ~is_start[1:]
+    gaps = np.diff(doc_ids)[inside]
+    gap_terms = (np.cumsum(is_start) - 1)[1:][inside]
+    largest = np.zeros(n_terms, dtype=np.int64)
+    np.maximum.at(largest, gap_terms, gaps)
+    limits = [np.iinfo(dtype).max for dtype in _DELTA_DTYPES[:-1]]
+    width = np.searchsorted(limits, largest).astype(np.int8)
+
+    offset = np.zeros(n_terms, dtype=np.int32)
+    deltas = []
+    for w, dtype in enumerate(_DELTA_DTYPES):
+        in_width = width == w
+        n_gaps = lengths[in_width] - 1
+        offset[in_width] = np.cumsum(n_gaps) - n_gaps
+        deltas.append(gaps[width[gap_terms] == w].astype(dtype))
+    return dict(
+        terms=term_ids[starts],
+        first=doc_ids[starts],
+        length=lengths.astype(np.int32),
+        width=width,
+        offset=offset,
+        deltas=deltas,
+    )
+
+
+def decode_postings(first: int, deltas: np.ndarray) -> np.ndarray:
+    """
+    Restore the doc ids of one posting list from its first id and gaps.
+
+    :param first: First doc id.
+    :type first: int
+    :param deltas: Gaps between doc ids.
+    :type deltas: np.ndarray
+    :return: Doc ids as int64.
+    :rtype: np.ndarray
+    """
+    doc_ids = np.empty(len(deltas) + 1, dtype=np.int64)
+    doc_ids[0] = first
+    np.cumsum(deltas, dtype=np.int64, out=doc_ids[1:])
+    doc_ids[1:] += first
+    return doc_ids
+
+
+def news_documents(
+    news: pd.DataFrame,
+    datetime_format: str = NEWS_DATETIME_FORMAT,
+    tz: str = "Europe/Moscow",
+) -> pd.DataFrame:
+    """
+    Turn MOEX news (parse_news_page / extract_link_info records, optionally merged with the title
+    from the news list) into indexable documents.
+
+    :param news: News with url, datetime, body and optional title and table_data columns.
+    :type news: pd.DataFrame
+    :param datetime_format: Format of the datetime column, defaults to NEWS_DATETIME_FORMAT.
+    :type datetime_format: str, optional
+    :param tz: Time zone of the datetime column, defaults to "Europe/Moscow".
+    :type tz: str, optional
+    :return: DataFrame with key (url), time and text columns.
+    :rtype: pd.DataFrame
+    """
+    parts = [
+        news[col].fillna("").astype(str) for col in ("title", "body") if col in news
+    ]
+    if "table_data" in news:
+        parts.append(
+            news["table_data"].map(
+                lambda rows: " ".join(
+                    str(value) for row in rows or [] for value in row.values()
+                )
+            )
+        )
+    text = parts[0]
+    for part in parts[1:]:
+        text = text + " " + part
+    times = pd.to_datetime(
+        news["datetime"].astype(str).str.strip(), format=datetime_format
+    ).dt.tz_localize(tz)
+    return pd.DataFrame({"key": news["url"], "time": times, "text": text})
+
+
+class SearchIndex:
+    """
+    Local inverted index of forum comments and MOEX news for ticker and keyword search.
+
+    Every term (word or pair of adjacent words) maps to a posting list of doc ids, stored as
+    a first id and delta-encoded gaps in the narrowest unsigned dtype, decoded with one cumsum.
+    Every add() encodes its batch as one new segment; doc ids grow with every batch, so
+    the lists of a term in segment order form one sorted list and older segments stay untouched.
+    Timestamps are kept once per document, a time range filter is a lookup by the decoded ids.
+
+    Example:
+    index = SearchIndex()
+    index.add_comments(comment_df)
+    index.add_news(news_df)
+    index.find_security("SBER", "RU0009029540", get_security_names("SBER"), start="2023-01-01")
+    """
+
+    def __init__(self) -> None:
+        # Term -> term id, the posting lists of a term id are found in the segments
+        self.terms = {}
+        self._segments = []
+        self._docs = []
+        self._doc_table = None
+        self.n_docs = 0
+        # Comments indexed so far, the key of the next one
+        self.n_comments = 0
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def add(
+        self,
+        texts: list,
+        times: pd.Series,
+        keys: list,
+        source: str,
+        token: list = None,
+        n_jobs: int = None,
+        chunk_size: int = 5_000,
+    ) -> None:
+        """
+        Index a batch of documents.
+
+        :param texts: Document texts.
+        :type texts: list
+        :param times: Document times, tz-aware.
+        :type times: pd.Series
+        :param keys: Document keys in their source, e.g. comment positions or news urls.
+        :type keys: list
+        :param source: Source name, e.g. "comments" or "news".
+        :type source: str
+        :param token: Token the document belongs to (forum thread), defaults to None.
+        :type token: list, optional
+        :param n_jobs: Number of worker processes for tokenization, defaults to None (one per CPU).
+        1 runs in-process.
+        :type n_jobs: int, optional
+        :param chunk_size: Texts per task, defaults to 5_000.
+        :type chunk_size: int, optional
+        """
+        texts = list(texts)
+        if not texts:
+            return
+        chunks = [
+            texts[lo : lo + chunk_size] for lo in range(0, len(texts), chunk_size)
+        ]
+        if n_jobs == 1 or len(chunks) == 1:
+            doc_terms = [
+                terms for chunk in map(_chunk_terms, chunks) for terms in chunk
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                doc_terms = [
+                    terms
+                    for chunk in executor.map(_chunk_terms, chunks)
+                    for terms in chunk
+                ]
+
+        first_id = self.n_docs
+        terms = pd.Series(doc_terms).explode().dropna()
+        doc_ids = first_id + terms.index.to_numpy(dtype=np.int64)
+        codes, vocabulary = pd.factorize(terms.to_numpy())
+        order = np.lexsort((doc_ids, codes))
+        self._add_segment(vocabulary, codes[order], doc_ids[order])
+
+        self._docs.append(
+            pd.DataFrame(
+                {
+                    "source": pd.Categorical([source] * len(texts)),
+                    "key": list(keys),
+                    "token": token,
+                    "time": pd.DatetimeIndex(times)
+                    .tz_convert("UTC")
+                    .tz_localize(None)
+                    .as_unit("ns"),
+                }
+            )
+        )
+        self._doc_table = None
+        self.n_docs += len(texts)
+
+    def add_comments(
+        self,
+        df: pd.DataFrame,
+        token_col: str = "token",
+        datetime_col: str = "comment_datetime",
+        text_col: str = "comment_text",
+        n_jobs: int = None,
+    ) -> None:
+        """
+        Index comments from preprocess_comment_data, keyed by their position among all indexed
+        comments: comment_df.iloc[keys], or pd.concat(batches, ignore_index=True) for many batches.
+        Row labels are not used, they repeat across the pages of preprocess_comment_data.
+
+        :param df: Comments.
+        :type df: pd.DataFrame
+        :param token_col: Column name for tokens, defaults to "token".
+        :type token_col: str, optional
+        :param datetime_col: Column name for comment times, defaults to "comment_datetime".
+        :type datetime_col: str, optional
+        :param text_col: Column name for comment texts, defaults to "comment_text".
+        :type text_col: str, optional
+        :param n_jobs: Number of worker processes, defaults to None (one per CPU).
+        :type n_jobs: int, optional
+        """
+        self.add(
+            df[text_col].fillna("").tolist(),
+            df[datetime_col],
+            list(range(self.n_comments, self.n_comments + len(df))),
+            "comments",
+            df[token_col].tolist(),
+            n_jobs,
+        )
+        self.n_comments += len(df)
+
+    def add_news(self, news: pd.DataFrame, n_jobs: int = None, **kwargs) -> None:
+        """
+        Index MOEX news, keyed by url.
+
+        :param news: News records, see news_documents.
+        :type news: pd.DataFrame
+        :param n_jobs: Number of worker processes, defaults to None (one per CPU).
+        :type n_jobs: int, optional
+        :param kwargs: datetime_format and tz, see news_documents.
+        """
+        docs = news_documents(news, **kwargs)
+        self.add(
+            docs["text"].tolist(),
+            docs["time"],
+            docs["key"].tolist(),
+            "news",
+            None,
+            n_jobs,
+        )
+
+    def _add_segment(
+        self, vocabulary: np.ndarray, codes: np.ndarray, doc_ids: np.ndarray
+    ) -> None:
+        terms = self.terms
+        ids = np.array(
+            [terms.setdefault(term, len(terms)) for term in vocabulary.tolist()],
+            dtype=np.int64,
+        )
+        term_ids = ids[codes]
+        order = np.lexsort((doc_ids, term_ids))
+        self._segments.append(encode_segment(term_ids[order], doc_ids[order]))
+
+    def compact(self) -> None:
+        """
+        Merge all segments into one, e.g. after many small add() calls.
+        """
+        if len(self._segments) < 2:
+            return
+        vocabulary = np.array(list(self.terms), dtype=object)
+        lists = [self.term_docs(term) for term in vocabulary]
+        codes = np.repeat(np.arange(len(lists)), [len(ids) for ids in lists])
+        doc_ids = np.concatenate(lists)
+        self._segments = []
+        self._add_segment(vocabulary, codes, doc_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the encoded segments in bytes, the term dictionary excluded.
+        """
+        return sum(
+            sum(arr.nbytes for arr in segment["deltas"])
+            + sum(
+                segment[name].nbytes
+                for name in ("terms", "first", "length", "width", "offset")
+            )
+            for segment in self._segments
+        )
+
+    @property
+    def docs(self) -> pd.DataFrame:
+        """
+        Document table: source, key, token and time (UTC), indexed by doc id.
+        """
+        if self._doc_table is None:
+            if len(self._docs) > 1:
+                self._docs = [pd.concat(self._docs, ignore_index=True)]
+            self._doc_table = (
+                self._docs[0]
+                if self._docs
+                else pd.DataFrame(columns=["source", "key", "token", "time"])
+            )
+        return self._doc_table
+
+    def term_docs(self, term: str) -> np.ndarray:
+        """
+        Decode the posting list of one normalized term.
+
+        :param term: Word or pair of words, see text_terms.
+        :type term: str
+        :return: Sorted doc ids.
+        :rtype: np.ndarray
+        """
+        term_id = self.terms.get(term)
+        lists = [np.empty(0, dtype=np.int64)]
+        if term_id is None:
+            return lists[0]
+        for segment in self._segments:
+            position = np.searchsorted(segment["terms"], term_id)
+            if (
+                position == len(segment["terms"])
+                or segment["terms"][position] != term_id
+            ):
+                continue
+            offset = segment["offset"][position]
+            gaps = segment["deltas"][segment["width"][position]][
+                offset : offset + segment["length"][position] - 1
+            ]
+            lists.append(decode_postings(segment["first"][position], gaps))
+        return np.concatenate(lists)
+
+    def search(
+        self,
+        queries: list,
+        start: str = None,
+        end: str = None,
+        source: str = None,
+    ) -> pd.DataFrame:
+        """
+        Find documents matching any of the queries.
+
+        :param queries: Lists of terms, a document matches a query when it holds all its terms,
+        see security_queries. A plain string is split into words that must all be present.
+        :type queries: list
+        :param start: Earliest document time, naive times are Moscow time, defaults to None.
+        :type start: str, optional
+        :param end: Latest document time, naive times are Moscow time, defaults to None.
+        :type end: str, optional
+        :param source: Only documents of this source, e.g. "news", defaults to None.
+        :type source: str, optional
+        :return: Matching rows of the document table, in doc id order.
+        :rtype: pd.DataFrame
+        """
+        if isinstance(queries, str):
+            queries = [words(queries)]
+        matches = [np.empty(0, dtype=np.int64)]
+        for query in queries:
+            if not query:
+                continue
+            ids = self.term_docs(query[0])
+            for term in query[1:]:
+                ids = np.intersect1d(ids, self.term_docs(term), assume_unique=True)
+            matches.append(ids)
+        ids = np.unique(np.concatenate(matches))
+
+        docs = self.docs
+        keep = np.ones(len(ids), dtype=bool)
+        times = docs["time"].to_numpy()[ids]
+        if start is not None:
+            keep &= times >= _utc(start)
+        if end is not None:
+            keep &= times <= _utc(end)
+        if source is not None:
+            keep &= docs["source"].to_numpy()[ids] == source
+        return docs.iloc[ids[keep]]
+
+    def find_security(
+        self,
+        token: str,
+        isin: str = None,
+        names: tuple = (),
+        start: str = None,
+        end: str = None,
+        source: str = None,
+    ) -> pd.DataFrame:
+        """
+        Find documents mentioning a security by ticker, ISIN or name.
+
+        :param token: Ticker.
+        :type token: str
+        :param isin: ISIN, defaults to None.
+        :type isin: str, optional
+        :param names: Short and full names, e.g. from get_security_names, defaults to ().
+        :type names: tuple, optional
+        :param start: Earliest document time, defaults to None.
+        :type start: str, optional
+        :param end: Latest document time, defaults to None.
+        :type end: str, optional
+        :param source: Only documents of this source, defaults to None.
+        :type source: str, optional
+        :return: Matching rows of the document table.
+        :rtype: pd.DataFrame
+        """
+        return self.search(security_queries(token, isin, names), start, end, source)
+
+
+def _utc(value: str) -> np.datetime64:
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is None:
+        timestamp = timestamp.tz_localize("Europe/Moscow")
+    return timestamp.tz_convert("UTC").tz_localize(None).as_unit("ns").to_datetime64()
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pnd_moex.general.event_study import event_positions
+
+# Detector parameters swept by default, the values hard-coded in anomaly_detect are included
+DEFAULT_GRID = {
+    "3over20": [0.1, 0.15, 0.2, 0.25, 0.3],
+    "80over3": [0.4, 0.6, 0.8, 1.0, 1.2],
+    "quantile": [0.95, 0.98, 0.99, 0.995],
+    "persist": [3.0, 4.0, 5.0, 6.0, 7.0],
+    "volatility": [4.0, 5.0, 6.0, 7.0],
+}
+# Sessions before the news date in which an anomaly counts, anomaly_news_markup_func uses BDay(10)
+DEFAULT_LOOKBACKS = (10,)
+# Both ADTK detectors in anomaly_detect use a 30 session window
+ROLLING_WINDOW = 30
+# Methods whose flag is extended over the three sessions of the pattern, as in anomaly_detect
+_PATTERN_METHODS = ("3over20", "80over3")
+# Part of the cache key, bump when statistics or scoring change
+_SWEEP_VERSION = 2
+
+
+def _shift(a: np.ndarray, periods: int) -> np.ndarray:
+    """Shift along the session axis (0), filling with NaN like pd.Series.shift."""
+    out = np.full_like(a, np.nan)
+    if periods > 0:
+        out[periods:] = a[:-periods]
+    elif periods < 0:
+        out[:periods] = a[-periods:]
+    else:
+        out[:] = a
+    return out
+
+
+def _nanquantile(a: np.ndarray, q: list) -> np.ndarray:
+    """Per-security quantiles, NaN for securities without data in the window."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanquantile(a, q, axis=0)
+
+
+def _iqr_scale(a: np.ndarray) -> np.ndarray:
+    """Express values in IQRs above the third quartile, so "> c" is ADTK InterQuartileRangeAD(c)."""
+    q1, q3 = _nanquantile(a, [0.25, 0.75])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (a - q3) / (q3 - q1)
+
+
+def precompute_statistics(close: np.ndarray) -> dict:
+    """
+    Compute once every statistic the detectors threshold.
+
+    Statistics follow anomaly_detect on a per-security series. Sessions in which a security did not
+    trade are forward filled first. "persist" and "volatility" re-implement the ADTK PersistAD and
+    VolatilityShiftAD statistics (difference to the mean of the previous 30 sessions, difference of the
+    rolling std after and before a session), so that the IQR factor c can be broadcast.
+
+    :param close: Close prices, sessions x securities.
+    :type close: np.ndarray
+    :return: Dictionary method -> statistic array, sessions x securities, plus "r1" (daily returns).
+    :rtype: dict
+    """
+    close_df = pd.DataFrame(np.asarray(close, dtype=np.float64)).ffill()
+    close = close_df.to_numpy()
+    r1 = close / _shift(close, 1) - 1
+    stats = dict(r1=r1)
+    # 3over20: growth on each of three consecutive sessions, starting at t. np.minimum keeps NaN,
+    # so a window with a missing return never passes, as in anomaly_detect
+    stats["3over20"] = np.minimum(np.minimum(r1, _shift(r1, -1)), _shift(r1, -2))
+    # 80over3: growth from t-1 to t+2
+    stats["80over3"] = _shift(close, -2) / _shift(close, 1) - 1
+    stats["quantile"] = r1
+
+    # PersistAD: value minus the mean of the previous window
+    rolling_mean = close_df.rolling(ROLLING_WINDOW).mean().to_numpy()
+    stats["persist"] = _iqr_scale(close - _shift(rolling_mean, 1))
+
+    # VolatilityShiftAD: std of the window starting at t minus std of the window before t
+    rolling_std = close_df.rolling(ROLLING_WINDOW).std().to_numpy()
+    volatility = _shift(rolling_std, 1 - ROLLING_WINDOW) - _shift(rolling_std, 1)
+    stats["volatility"] = _iqr_scale(volatility)
+    return stats
+
+
+def flag_matrices(stat: np.ndarray, method: str, values: list) -> np.ndarray:
+    """
+    Flag anomalies for a whole grid of parameter values at once.
+
+    :param stat: Statistic of the method from precompute_statistics.
+    :type stat: np.ndarray
+    :param method: One of DEFAULT_GRID keys.
+    :type method: str
+    :param values: Thresholds (3over20, 80over3), quantiles (quantile) or IQR factors c (persist, volatility).
+    :type values: list
+    :return: Boolean array, values x sessions x securities.
+    :rtype: np.ndarray
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if method == "quantile":
+        thresholds = _nanquantile(stat, values)[:, None, :]
+    else:
+        thresholds = values[:, None, None]
+    with np.errstate(invalid="ignore"):
+        flags = stat[None] > thresholds
+    if method in _PATTERN_METHODS:
+        # Mark the three sessions of the pattern, as anomaly_detect does
+        extended = flags.copy()
+        extended[:, 1:] |= flags[:, :-1]
+        extended[:, 2:] |= flags[:, :-2]
+        flags = extended
+    return flags
+
+
+def event_matrix(
+    events: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+    secids: pd.Index,
+    token_col: str = "token",
+    date_col: str = "p_date",
+) -> np.ndarray:
+    """
+    Mark labelled pump-and-dump dates on the sessions x securities grid.
+
+    :param events: Events table, e.g. datasets/pnd_token_date.parquet, one row per token with a list of dates.
+    :type events: pd.DataFrame
+    :param dates: Session dates.
+    :type dates: pd.DatetimeIndex
+    :param secids: Security ids.
+    :type secids: pd.Index
+    :param token_col: Column name for tokens, defaults to "token".
+    :type token_col: str, optional
+    :param date_col: Column name for event dates, defaults to "p_date".
+    :type date_col: str, optional
+    :return: Boolean array, sessions x securities; an event off a session is put on the previous session.
+    :rtype: np.ndarray
+    """
+    located = event_positions(events, dates, secids, token_col, date_col)
+    mask = np.zeros((len(dates), len(secids)), dtype=bool)
+    mask[located["row"].to_numpy(), located["col"].to_numpy()] = True
+    return mask
+
+
+def score_flags(flags: np.ndarray, events: np.ndarray, lookback: int) -> list[dict]:
+    """
+    Score flag matrices against labelled events.
+
+    An event is detected if a flag is raised within `lookback` sessions before it (inclusive).
+    A flagged episode (a run of flags) is a true positive if an event follows within `lookback` sessions.
+    Lead time is the number of sessions from the first flag in the window to the event.
+
+    :param flags: Boolean array, values x sessions x securities.
+    :type flags: np.ndarray
+    :param events: Boolean event matrix, sessions x securities.
+    :type events: np.ndarray
+    :param lookback: Detection window in sessions.
+    :type lookback: int
+    :return: One dictionary of metrics per value.
+    :rtype: list[dict]
+    """
+    n_sessions = events.shape[0]
+    ev_rows, ev_cols = np.nonzero(events)
+    win_start = np.maximum(ev_rows - lookback, 0)
+
+    # Index of the next flag at or after every session, per security
+    positions = np.arange(n_sessions)[None, :, None]
+    next_flag = np.where(flags, positions, n_sessions)
+    next_flag = np.minimum.accumulate(next_flag[:, ::-1], axis=1)[:, ::-1]
+    first = next_flag[:, win_start, ev_cols]
+    hit = first <= ev_rows[None]
+    lead = np.where(hit, ev_rows[None] - first, np.nan)
+
+    onsets = flags.copy()
+    onsets[:, 1:] &= ~flags[:, :-1]
+    # Events in [t, t + lookback] for every session t
+    ev_cum = np.vstack(
+        [np.zeros((1, events.shape[1]), dtype=np.int64), np.cumsum(events, axis=0)]
+    )
+    ahead = (
+        ev_cum[np.minimum(np.arange(n_sessions) + lookback + 1, n_sessions)]
+        - ev_cum[:-1]
+    )
+    n_onsets = onsets.sum(axis=(1, 2))
+    true_onsets = (onsets & (ahead > 0)[None]).sum(axis=(1, 2))
+
+    results = []
+    for i in range(flags.shape[0]):
+        n_hits = int(hit[i].sum())
+        precision = true_onsets[i] / n_onsets[i] if n_onsets[i] else np.nan
+        recall = n_hits / len(ev_rows) if len(ev_rows) else np.nan
+        results.append(
+            dict(
+                precision=float(precision),
+                recall=float(recall),
+                f1=(
+                    float(2 * precision * recall / (precision + recall))
+                    if precision + recall > 0
+                    else 0.0
+                ),
+                mean_lead=float(np.nanmean(lead[i])) if n_hits else np.nan,
+                median_lead=float(np.nanmedian(lead[i])) if n_hits else np.nan,
+                n_flags=int(n_onsets[i]),
+                n_hits=n_hits,
+                n_events=int(len(ev_rows)),
+            )
+        )
+    return results
+
+
+def _sweep_method(args: tuple) -> list[dict]:
+    method, values, stat, events, lookbacks = args
+    flags = flag_matrices(stat, method, values)
+    results = []
+    for lookback in lookbacks:
+        for value, metrics in zip(values, score_flags(flags, events, lookback)):
+            results.append(
+                dict(method=method, value=value, lookback=lookback, **metrics)
+            )
+    return results
+
+
+def _fingerprint(close: np.ndarray, events: np.ndarray) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(close).tobytes())
+    digest.update(np.packbits(events).tobytes())
+    digest.update(str(close.shape).encode())
+    return digest.hexdigest()
+
+
+def _cache_file(
+    cache_dir: str, fingerprint: str, method: str, value: float, lookback: int
+) -> str:
+    key = json.dumps([_SWEEP_VERSION, fingerprint, method, float(value), int(lookback)])
+    return os.path.join(
+        cache_dir, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".json"
+    )
+
+
+def threshold_sweep(
+    close: pd.DataFrame,
+    events: pd.DataFrame,
+    grid: dict = DEFAULT_GRID,
+    lookbacks: tuple = DEFAULT_LOOKBACKS,
+    n_jobs: int = None,
+    cache_dir: str = None,
+    token_col: str = "token",
+    date_col: str = "p_date",
+) -> pd.DataFrame:
+    """
+    Evaluate a grid of detector parameters on every security against labelled pump-and-dump events.
+
+    Statistics are computed once for the whole board, all values of a method are thresholded in one
+    broadcast, and methods run in parallel processes. Scores are cached per parameter set, so growing
+    the grid only computes the new values.
+
+    For example:
+    close = PriceMatrix.open("datasets/matrix").frame("CLOSE")
+    events = pd.read_parquet("datasets/pnd_token_date.parquet")
+    threshold_sweep(close, events, lookbacks=(5, 10)).sort_values("f1")
+
+    :param close: Close prices with session dates as the index and SECIDs as columns.
+    :type close: pd.DataFrame
+    :param events: Events table with token and list of dates columns.
+    :type events: pd.DataFrame
+    :param grid: Method -> list of parameter values, defaults to DEFAULT_GRID.
+    :type grid: dict, optional
+    :param lookbacks: Detection windows in sessions, defaults to DEFAULT_LOOKBACKS.
+    :type lookbacks: tuple, optional
+    :param n_jobs: Number of worker processes, defaults to None (one per CPU). 1 runs in-process.
+    :type n_jobs: int, optional
+    :param cache_dir: Directory for cached scores, defaults to None (no caching).
+    :type cache_dir: str, optional
+    :param token_col: Column name for tokens in events, defaults to "token".
+    :type token_col: str, optional
+    :param date_col: Column name for event dates in events, defaults to "p_date".
+    :type date_col: str, optional
+    :return: One row per (method, value, lookback) with precision, recall, f1, lead times and counts.
+    :rtype: pd.DataFrame
+    """
+    values = close.to_numpy(dtype=np.float64)
+    ev = event_matrix(
+        events, pd.DatetimeIndex(close.index), close.columns, token_col, date_col
+    )
+
+    cached, todo = [], {}
+    fingerprint = _fingerprint(values, ev) if cache_dir else None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    for method, method_values in grid.items():
+        for value in method_values:
+            for lookback in lookbacks:
+                file_path = cache_dir and _cache_file(
+                    cache_dir, fingerprint, method, value, lookback
+                )
+                if file_path and os.path.exists(file_path):
+                    with open(file_path, encoding="UTF-8") as file:
+                        cached.append(json.load(file))
+                    continue
+                todo.setdefault(method, set()).add(value)
+
+    computed = []
+    if todo:
+        stats = precompute_statistics(values)
+        tasks = [
+            (method, sorted(vals), stats[method], ev, lookbacks)
+            for method, vals in todo.items()
+        ]
+        if n_jobs == 1 or len(tasks) == 1:
+            batches = map(_sweep_method, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                batches = list(executor.map(_sweep_method, tasks))
+        for batch in batches:
+            computed.extend(batch)
+        if cache_dir:
+            for row in computed:
+                file_path = _cache_file(
+                    cache_dir, fingerprint, row["method"], row["value"], row["lookback"]
+                )
+                with open(file_path, mode="w", encoding="UTF-8") as file:
+                    json.dump(row, file)
+
+    result = pd.DataFrame(cached + computed)
+    if result.empty:
+        return result
+    # A value is recomputed for every lookback if one of them was missing from the cache
+    result = result.drop_duplicates(["method", "value", "lookback"])
+    return result.sort_values(["method", "value", "lookback"], ignore_index=True)
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import random
+import time
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from pnd_moex.util import profiling
+from pnd_moex.util.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+# Statuses that mean "slow down" or "try later", other errors are returned to the caller as is
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Smoothing of the latency average
+_LATENCY_ALPHA = 0.2
+
+
+class HostLimiter:
+    """
+    AIMD concurrency limit of one host.
+
+    Every success adds increase / limit, so the limit grows by about `increase` per round of
+    requests. A 429, 5xx or transport error multiplies it by `decrease`, and a latency average
+    above latency_tolerance times the best seen one by `latency_decrease`. Decreases happen at
+    most once per average latency, so one overload burst costs one step and not one per
+    request in flight.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_decrease: float = 0.9,
+        latency_tolerance: float = 2.0,
+    ) -> None:
+        """
+        :param initial: Starting concurrency, defaults to 4.
+        :type initial: int, optional
+        :param min_limit: Lowest concurrency, defaults to 1.
+        :type min_limit: int, optional
+        :param max_limit: Highest concurrency, defaults to 32.
+        :type max_limit: int, optional
+        :param increase: Additive increase per round of requests, defaults to 1.0.
+        :type increase: float, optional
+        :param decrease: Multiplicative decrease on errors, defaults to 0.5.
+        :type decrease: float, optional
+        :param latency_decrease: Multiplicative decrease on latency growth, defaults to 0.9.
+        :type latency_decrease: float, optional
+        :param latency_tolerance: Allowed growth of the latency over the best one, defaults to 2.0.
+        :type latency_tolerance: float, optional
+        """
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_decrease = latency_decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self._last_decrease = 0.0
+        self._condition = None
+        self._loop = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # The learned limit outlives one asyncio.run(), the condition is bound to its loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self.latency or 0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+    def on_success(self, latency: float) -> None:
+        """
+        Record a successful request.
+
+        :param latency: Request time in seconds.
+        :type latency: float
+        """
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += _LATENCY_ALPHA * (latency - self.latency)
+        # The best latency creeps up slowly, so a host that got slower for good is re-learned
+        self.best_latency = min(
+            self.latency,
+            self.latency if self.best_latency is None else self.best_latency * 1.001,
+        )
+        if self.latency > self.latency_tolerance * self.best_latency:
+            self._decrease(self.latency_decrease)
+        else:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+
+    def on_congestion(self) -> None:
+        """
+        Record a 429, 5xx or transport error.
+        """
+        self._decrease(self.decrease)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds from a Retry-After header given as seconds or an HTTP date, 0 if missing."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, moment.timestamp() - time.time())
+
+
+class FetchScheduler:
+    """
+    Adaptive HTTP fetcher: a continuous work queue with per-host AIMD concurrency and retries.
+
+    URLs are taken from one queue by max_concurrency workers. A worker first waits for a
+    free slot of the URL's host, so every host runs at its own HostLimiter concurrency, and a
+    slow request only holds its own slot instead of a whole chunk. Limits are kept between
+    fetch_all() calls, so a reused scheduler starts from the rate it learned. 429/5xx
+    responses and transport errors are retried with full-jitter exponential backoff, never
+    shorter than the server's Retry-After.
+
+    Example:
+    scheduler = FetchScheduler(max_concurrency=16)
+    responses = asyncio.run(scheduler.fetch_all(urls))
+    scheduler.stats()  # per-host throughput, retries and the learned concurrency
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float = 30,
+        **limiter_kwargs,
+    ) -> None:
+        """
+        :param initial_concurrency: Starting concurrency of every host, defaults to 4.
+        :type initial_concurrency: int, optional
+        :param max_concurrency: Highest concurrency of a host, also the number of workers
+        and pooled connections, defaults to 32.
+        :type max_concurrency: int, optional
+        :param retries: Retries of one URL after the first attempt, defaults to 4.
+        :type retries: int, optional
+        :param backoff_base: First backoff cap in seconds, doubled on every retry, defaults to 1.0.
+        :type backoff_base: float, optional
+        :param backoff_max: Largest backoff cap in seconds, defaults to 60.0.
+        :type backoff_max: float, optional
+        :param timeout: Maximum wait time for a server response in seconds, defaults to 30.
+        :type timeout: float, optional
+        :param limiter_kwargs: min_limit, increase, decrease, latency_decrease and latency_tolerance,
+        see HostLimiter.
+        """
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.limiter_kwargs = limiter_kwargs
+        self.limiters = {}
+        self._stats = {}
+
+    def limiter(self, host: str) -> HostLimiter:
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(
+                self.initial_concurrency,
+                max_limit=self.max_concurrency,
+                **self.limiter_kwargs,
+            )
+        return self.limiters[host]
+
+    def _host_stats(self, host: str) -> dict:
+        if host not in self._stats:
+            self._stats[host] = dict(
+                requests=0,
+                ok=0,
+                retries=0,
+                throttled=0,
+                server_errors=0,
+                transport_errors=0,
+                failed=0,
+                bytes=0,
+                peak_concurrency=0,
+                first_start=None,
+                last_end=None,
+            )
+        return self._stats[host]
+
+    def client(self, **kwargs) -> httpx.AsyncClient:
+        """
+        Async client sized for the scheduler: connection pool of max_concurrency and no pool timeout,
+        requests queue in the limiters instead.
+
+        :param kwargs: Other httpx.AsyncClient arguments.
+        :return: Client.
+        :rtype: httpx.AsyncClient
+        """
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            timeout=httpx.Timeout(self.timeout, pool=None),
+            **kwargs,
+        )
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        cap = min(self.backoff_max, self.backoff_base * 2**attempt)
+        delay = random.uniform(0, cap)
+        if response is not None:
+            delay = max(delay, _retry_after(response))
+        return delay
+
+    async def get(
+        self, client: httpx.AsyncClient, url: str, **kwargs
+    ) -> httpx.Response:
+        """
+        GET one URL within its host's concurrency limit, retrying 429/5xx and transport errors.
+
+        :param client: Async HTTP client.
+        :type client: httpx.AsyncClient
+        :param url: URL.
+        :type url: str
+        :param kwargs: Other client.get arguments, e.g. params.
+        :return: Last response, possibly with a retryable status once retries are exhausted.
+        :rtype: httpx.Response
+        :raises httpx.TransportError: If the last attempt failed without a response.
+        """
+        host = urlsplit(str(url)).netloc
+        limiter = self.limiter(host)
+        stats = self._host_stats(host)
+        for attempt in range(self.retries + 1):
+            await limiter.acquire()
+            stats["peak_concurrency"] = max(
+                stats["peak_concurrency"], limiter.in_flight
+            )
+            start = time.monotonic()
+            if stats["first_start"] is None:
+                stats["first_start"] = start
+            response = None
+            try:
+                stats["requests"] += 1
+                response = await client.get(url, **kwargs)
+            except httpx.TransportError:
+                stats["transport_errors"] += 1
+                limiter.on_congestion()
+                if attempt == self.retries:
+                    stats["failed"] += 1
+                    raise
+            finally:
+                stats["last_end"] = time.monotonic()
+                await limiter.release()
+
+            if response is not None:
+                stats["bytes"] += len(response.content)
+                if response.status_code not in RETRY_STATUSES:
+                    stats["ok"] += 1
+                    limiter.on_success(stats["last_end"] - start)
+                    return response
+                if response.status_code == 429:
+                    stats["throttled"] += 1
+                    profiling.increment("fetch_throttled")
+                else:
+                    stats["server_errors"] += 1
+                limiter.on_congestion()
+                if attempt == self.retries:
+                    stats["failed"] += 1
+                    return response
+            stats["retries"] += 1
+            profiling.increment("fetch_retries")
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def fetch_all(self, urls: list, client: httpx.AsyncClient = None) -> list:
+        """
+        Fetch many URLs through the work queue.
+
+        :param urls: URLs to fetch.
+        :type urls: list
+        :param client: Async HTTP client, defaults to a new one from client().
+        :type client: httpx.AsyncClient, optional
+        :return: Responses in the order of urls, None where every attempt failed without a response.
+        :rtype: list
+        """
+        if client is None:
+            async with self.client() as own_client:
+                return await self.fetch_all(urls, own_client)
+
+        results = [None] * len(urls)
+        queue = asyncio.Queue()
+        for item in enumerate(urls):
+            queue.put_nowait(item)
+
+        async def worker():
+            while True:
+                try:
+                    i, url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    results[i] = await self.get(client, url)
+                except httpx.TransportError:
+                    results[i] = None
+
+        n_workers = min(len(urls), self.max_concurrency)
+        await asyncio.gather(*[worker() for _ in range(n_workers)])
+        return results
+
+    def stats(self) -> pd.DataFrame:
+        """
+        Per-host counters, throughput and the current concurrency limit.
+
+        :return: DataFrame indexed by host.
+        :rtype: pd.DataFrame
+        """
+        rows = []
+        for host, stats in self._stats.items():
+            limiter = self.limiters[host]
+            seconds = (
+                stats["last_end"] - stats["first_start"]
+                if stats["first_start"] is not None and stats["last_end"] is not None
+                else 0.0
+            )
+            row = {
+                k: v for k, v in stats.items() if k not in ("first_start", "last_end")
+            }
+            row.update(
+                host=host,
+                seconds=seconds,
+                pages_per_second=stats["ok"] / seconds if seconds else 0.0,
+                bytes_per_second=stats["bytes"] / seconds if seconds else 0.0,
+                concurrency=limiter.limit,
+                latency_ms=(limiter.latency or 0.0) * 1000,
+            )
+            rows.append(row)
+        return pd.DataFrame(rows).set_index("host") if rows else pd.DataFrame()
@@ -0,0 +1,50 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module placeholder which imports the real module on first attribute access.
+
+    Heavy backends (ADTK, bs4, selenium, plotly, httpx, ...) are only needed by some entry points,
+    so the modules using them keep a LazyModule instead of importing at module import time.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._lazy_module = None
+
+    def _load(self) -> types.ModuleType:
+        if self._lazy_module is None:
+            try:
+                self._lazy_module = importlib.import_module(self.__name__)
+            except ImportError as e:
+                raise ImportError(
+                    f"Optional dependency '{self.__name__}' is required for this function. "
+                    f"Install it with 'pip install {self.__name__.split('.')[0]}'."
+                ) from e
+        return self._lazy_module
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._load(), attr)
+        # Cache on the placeholder, so later lookups skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self) -> list:
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Get a module which is imported only when one of its attributes is used.
+
+    For example:
+    fuzz = lazy_import("fuzzywuzzy.fuzz") => fuzzywuzzy is imported on the first fuzz.ratio(...) call
+
+    :param name: Absolute module name.
+    :type name: str
+    :return: Lazy module placeholder.
+    :rtype: types.ModuleType
+    """
+    return LazyModule(name)
@@ -0,0 +1,291 @@
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from pnd_moex.util import profiling
+
+# Memoization is opt-in: set PND_MOEX_CACHE=memory (or call enable()) for the in-memory tier,
+# or PND_MOEX_CACHE=<directory> to also keep results as Parquet files on disk.
+_ENV_FLAG = "PND_MOEX_CACHE"
+_MEMORY_ONLY = "memory"
+# Part of every key, bump when the key layout or stored format changes
+_CACHE_VERSION = 1
+
+_lock = threading.Lock()
+_enabled = False
+_cache_dir = None
+_max_items = 256
+_max_disk_bytes = 1 << 30
+_memory = OrderedDict()
+_stats = {}
+
+
+def enable(
+    cache_dir: str = None, max_items: int = 256, max_disk_bytes: int = 1 << 30
+) -> None:
+    """
+    Turn memoization on.
+
+    :param cache_dir: Directory of the on-disk Parquet tier, defaults to None (memory only).
+    :type cache_dir: str, optional
+    :param max_items: Results kept in the in-memory LRU tier, defaults to 256.
+    :type max_items: int, optional
+    :param max_disk_bytes: Size of the on-disk tier, the least recently used files are removed
+    above it, defaults to 1 GiB.
+    :type max_disk_bytes: int, optional
+    """
+    global _enabled, _cache_dir, _max_items, _max_disk_bytes
+    _enabled = True
+    _cache_dir = cache_dir
+    _max_items = max_items
+    _max_disk_bytes = max_disk_bytes
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+
+def disable() -> None:
+    """
+    Turn memoization off and drop the in-memory tier. Files on disk are kept.
+    """
+    global _enabled
+    _enabled = False
+    with _lock:
+        _memory.clear()
+
+
+def is_enabled() -> bool:
+    """
+    Check whether memoized functions currently use the cache.
+
+    :return: True if results are looked up and stored.
+    :rtype: bool
+    """
+    return _enabled
+
+
+def clear(disk: bool = False) -> None:
+    """
+    Drop cached results and statistics.
+
+    :param disk: Also remove the Parquet files of the on-disk tier, defaults to False.
+    :type disk: bool, optional
+    """
+    with _lock:
+        _memory.clear()
+        _stats.clear()
+    if disk and _cache_dir is not None:
+        for path, _, _ in _disk_files():
+            _remove(path)
+
+
+def stats() -> dict:
+    """
+    Get hit/miss statistics per memoized function.
+
+    :return: Dictionary name -> memory_hits, disk_hits, misses, evictions and hit_rate.
+    :rtype: dict
+    """
+    with _lock:
+        result = {}
+        for name, counts in _stats.items():
+            calls = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+            hit_rate = (calls - counts["misses"]) / calls if calls else 0.0
+            result[name] = dict(counts, hit_rate=hit_rate)
+        return result
+
+
+def _count(name: str, event: str) -> None:
+    with _lock:
+        counts = _stats.setdefault(
+            name, dict(memory_hits=0, disk_hits=0, misses=0, evictions=0)
+        )
+        counts[event] += 1
+    profiling.increment(f"cache_{event}")
+
+
+def _update_hash(h: "hashlib._Hash", value: any) -> None:
+    """Feed a function argument into the hash, array data is hashed as raw bytes."""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        h.update(type(value).__name__.encode())
+        if isinstance(value, pd.DataFrame):
+            h.update(repr((list(value.columns), list(value.dtypes))).encode())
+        else:
+            h.update(repr((value.name, value.dtype)).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Index):
+        h.update(pd.util.hash_pandas_object(value).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(f"{value.dtype}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_hash(h, item)
+    elif isinstance(value, dict):
+        h.update(f"dict{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode())
+            _update_hash(h, value[key])
+    else:
+        h.update(repr(value).encode())
+    h.update(b"\x00")
+
+
+def make_key(name: str, version: any, arguments: dict) -> str:
+    """
+    Content hash of a call: function name, its version and every argument value.
+
+    :param name: Function name.
+    :type name: str
+    :param version: Function version, any change makes new keys.
+    :type version: any
+    :param arguments: Argument name -> value, defaults included.
+    :type arguments: dict
+    :return: Hex digest.
+    :rtype: str
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{_CACHE_VERSION}:{name}:{version}".encode())
+    _update_hash(h, arguments)
+    return h.hexdigest()
+
+
+def _disk_path(name: str, key: str) -> str:
+    return os.path.join(_cache_dir, name, f"{key}.parquet")
+
+
+def _disk_files() -> list:
+    files = []
+    for root, _, names in os.walk(_cache_dir):
+        for file_name in names:
+            if file_name.endswith(".parquet"):
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                files.append((path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _read_disk(name: str, key: str) -> pd.DataFrame:
+    path = _disk_path(name, key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        # A broken file is a miss, the result is computed and written again
+        _remove(path)
+        return None
+    freq = df.attrs.pop("index_freq", None)
+    if freq is not None:
+        df.index.freq = freq
+    # The modification time orders files for eviction
+    os.utime(path)
+    return df
+
+
+def _write_disk(name: str, key: str, df: pd.DataFrame) -> None:
+    path = _disk_path(name, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = df.copy(deep=False)
+    freq = getattr(df.index, "freqstr", None)
+    df.attrs = {"index_freq": freq} if freq else {}
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+    files = _disk_files()
+    total = sum(size for _, size, _ in files)
+    for old_path, size, _ in sorted(files, key=lambda file: file[2]):
+        if total <= _max_disk_bytes:
+            break
+        if old_path == path:
+            continue
+        _remove(old_path)
+        total -= size
+        _count(os.path.basename(os.path.dirname(old_path)), "evictions")
+
+
+def _memory_put(key: str, value: any) -> None:
+    with _lock:
+        _memory[key] = value
+        _memory.move_to_end(key)
+        while len(_memory) > _max_items:
+            _memory.popitem(last=False)
+
+
+def memoize(name: str = None, version: any = 0) -> callable:
+    """
+    Decorator caching DataFrame results by a content hash of the arguments.
+
+    Equal data gives the same key wherever it comes from, so a changed series or parameter is
+    a new entry and stale results are never returned. Bump version when the function changes.
+    Callers get a copy of the cached result and may modify it.
+
+    :param name: Cache namespace, defaults to the function name.
+    :type name: str, optional
+    :param version: Function version, part of every key, or a callable returning it, called on
+    the first cached call, defaults to 0.
+    :type version: any, optional
+    :return: Decorator.
+    :rtype: callable
+    """
+
+    def decorator(func: callable) -> callable:
+        label = name or func.__name__
+        signature = inspect.signature(func)
+        resolved = []
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            if not resolved:
+                resolved.append(version() if callable(version) else version)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(label, resolved[0], bound.arguments)
+
+            with _lock:
+                result = _memory.get(key)
+                if result is not None:
+                    _memory.move_to_end(key)
+            if result is not None:
+                _count(label, "memory_hits")
+                return result.copy()
+
+            if _cache_dir is not None:
+                result = _read_disk(label, key)
+                if result is not None:
+                    _count(label, "disk_hits")
+                    _memory_put(key, result)
+                    return result.copy()
+
+            _count(label, "misses")
+            result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                _memory_put(key, result.copy())
+                if _cache_dir is not None:
+                    _write_disk(label, key, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+if os.environ.get(_ENV_FLAG, "") not in ("", "0"):
+    _target = os.environ[_ENV_FLAG]
+    enable(cache_dir=None if _target == _MEMORY_ONLY else _target)
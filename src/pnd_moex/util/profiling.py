@@ -0,0 +1,238 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Instrumentation is opt-in: set PND_MOEX_PROFILE=1 (or call enable()) to collect,
+# PND_MOEX_PROFILE=memory to also track memory high-water marks,
+# and PND_MOEX_PROFILE_OUTPUT=<path>.json|.prom to dump the results at exit.
+_ENV_FLAG = "PND_MOEX_PROFILE"
+_ENV_OUTPUT = "PND_MOEX_PROFILE_OUTPUT"
+
+_lock = threading.Lock()
+_enabled = False
+_trace_memory = False
+_timers = {}
+_counters = {}
+_memory_peaks = {}
+# Open stages as [start_memory, running_peak] pairs, used for memory high-water marks
+_memory_stack = []
+
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    Turn instrumentation on.
+
+    :param trace_memory: Track per-stage memory high-water marks with tracemalloc, defaults to False.
+    Memory tracing slows Python allocations noticeably, so it is off unless asked for.
+    :type trace_memory: bool, optional
+    """
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    """
+    Turn instrumentation off. Collected values are kept until reset() is called.
+    """
+    global _enabled, _trace_memory
+    _enabled = False
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _trace_memory = False
+    _memory_stack.clear()
+
+
+def is_enabled() -> bool:
+    """
+    Check whether instrumentation is currently collecting.
+
+    :return: True if timers and counters are recorded.
+    :rtype: bool
+    """
+    return _enabled
+
+
+def reset() -> None:
+    """
+    Drop all collected timers, counters and memory peaks.
+    """
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _memory_peaks.clear()
+
+
+def increment(name: str, value: float = 1) -> None:
+    """
+    Increase a named counter, e.g. pages fetched or comments parsed.
+
+    :param name: Counter name.
+    :type name: str
+    :param value: Increment value, defaults to 1.
+    :type value: float, optional
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def _memory_enter() -> None:
+    _, peak = tracemalloc.get_traced_memory()
+    # The peak is about to be reset, so hand it over to every open stage first
+    for frame in _memory_stack:
+        frame[1] = max(frame[1], peak)
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    _memory_stack.append([current, current])
+
+
+def _memory_exit(name: str) -> None:
+    if not _memory_stack:
+        return
+    _, peak = tracemalloc.get_traced_memory()
+    start, running_peak = _memory_stack.pop()
+    for frame in _memory_stack:
+        frame[1] = max(frame[1], peak)
+    stage_peak = max(running_peak, peak) - start
+    with _lock:
+        _memory_peaks[name] = max(_memory_peaks.get(name, 0), stage_peak)
+
+
+@contextmanager
+def timer(name: str):
+    """
+    Time a block of code and record it under the given stage name.
+
+    Does nothing while instrumentation is disabled.
+
+    :param name: Stage name, e.g. "fetch" or "parse".
+    :type name: str
+    """
+    if not _enabled:
+        yield
+        return
+    trace_memory = _trace_memory and tracemalloc.is_tracing()
+    if trace_memory:
+        _memory_enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            _memory_exit(name)
+        with _lock:
+            stats = _timers.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+
+def timed(name: str = None) -> callable:
+    """
+    Decorator version of timer(). The stage name defaults to the function name.
+
+    :param name: Stage name, defaults to None.
+    :type name: str, optional
+    :return: Decorator.
+    :rtype: callable
+    """
+
+    def decorator(func: callable) -> callable:
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with timer(label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict:
+    """
+    Collect the current instrumentation values.
+
+    :return: Dictionary with timers, counters and memory peaks (in bytes).
+    :rtype: dict
+    """
+    with _lock:
+        return dict(
+            timers={
+                name: dict(count=count, total_seconds=total, max_seconds=max_)
+                for name, (count, total, max_) in _timers.items()
+            },
+            counters=dict(_counters),
+            memory_peak_bytes=dict(_memory_peaks),
+        )
+
+
+def to_prometheus(data: dict = None, prefix: str = "pnd_moex") -> str:
+    """
+    Render instrumentation values in the Prometheus text exposition format.
+
+    :param data: Snapshot to render, defaults to the current snapshot().
+    :type data: dict, optional
+    :param prefix: Metric name prefix, defaults to "pnd_moex".
+    :type prefix: str, optional
+    :return: Prometheus text.
+    :rtype: str
+    """
+    data = snapshot() if data is None else data
+    lines = []
+    stage_metrics = [
+        ("stage_calls_total", "counter", "count"),
+        ("stage_seconds_total", "counter", "total_seconds"),
+        ("stage_max_seconds", "gauge", "max_seconds"),
+    ]
+    for metric, kind, key in stage_metrics:
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for stage, stats in data["timers"].items():
+            lines.append(f'{prefix}_{metric}{{stage="{stage}"}} {stats[key]}')
+    lines.append(f"# TYPE {prefix}_stage_memory_peak_bytes gauge")
+    for stage, value in data["memory_peak_bytes"].items():
+        lines.append(f'{prefix}_stage_memory_peak_bytes{{stage="{stage}"}} {value}')
+    for counter, value in data["counters"].items():
+        lines.append(f"# TYPE {prefix}_{counter}_total counter")
+        lines.append(f"{prefix}_{counter}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path: str, fmt: str = None) -> None:
+    """
+    Write instrumentation values to a file.
+
+    :param path: Output file path.
+    :type path: str
+    :param fmt: Either "json" or "prometheus". If None, chosen by extension: ".json" gives JSON, anything else Prometheus text.
+    :type fmt: str, optional
+    """
+    if fmt is None:
+        fmt = "json" if path.endswith(".json") else "prometheus"
+    if fmt == "json":
+        content = json.dumps(snapshot(), indent=2)
+    elif fmt == "prometheus":
+        content = to_prometheus()
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    with open(path, mode="w", encoding="UTF-8") as file:
+        file.write(content)
+
+
+if os.environ.get(_ENV_FLAG, "") not in ("", "0"):
+    enable(trace_memory=os.environ.get(_ENV_FLAG) == "memory")
+    if os.environ.get(_ENV_OUTPUT):
+        atexit.register(export, os.environ[_ENV_OUTPUT])
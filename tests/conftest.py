@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+SPAM = "Покупайте акции TEST прямо сейчас, завтра будет рост на сто процентов"
+FILLERS = [
+    "Отчёт за квартал вышел хуже ожиданий, выручка упала",
+    "Дивиденды в этом году, скорее всего, не заплатят",
+    "Кто-нибудь был на собрании акционеров в пятницу?",
+    "Объёмы торгов низкие, ждём новостей от регулятора",
+]
+
+
+@pytest.fixture
+def comment_pages() -> list:
+    # Per-page frames as in preprocess_comment_data: row labels restart on every page
+    pages = []
+    for page in range(3):
+        texts = [FILLERS[(page + i) % len(FILLERS)] for i in range(4)]
+        texts[page] = SPAM
+        pages.append(
+            pd.DataFrame(
+                {
+                    "token": "TEST",
+                    "comment_datetime": pd.Timestamp(
+                        "2024-01-10 12:00", tz="Europe/Moscow"
+                    )
+                    + pd.Timedelta(minutes=page),
+                    "user_id": [f"user{page}-{i}" for i in range(4)],
+                    "comment_text": texts,
+                    "is_spam": [i == page for i in range(4)],
+                }
+            )
+        )
+    return pages
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from pnd_moex.general.bursts import CommentBursts, session_counts
+
+
+def _comments(times: list, users: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "token": "TEST",
+            "comment_datetime": pd.DatetimeIndex(times).tz_localize("Europe/Moscow"),
+            "user_id": users,
+        }
+    )
+
+
+def test_comments_after_last_session_wait_for_extend_sessions():
+    bursts = CommentBursts(pd.bdate_range("2024-01-01", "2024-01-05"))
+    bursts.add_comments(
+        _comments(
+            ["2024-01-05 12:00", "2024-01-06 12:00", "2024-01-07 12:00"],
+            ["a", "b", "b"],
+        )
+    )
+    bursts.extend_sessions(pd.DatetimeIndex(["2024-01-08"]))
+    activity = bursts.activity_frame("TEST")
+    # Saturday and Sunday comments land on Monday
+    assert activity.loc["2024-01-08", "comments"] == 2
+    assert activity.loc["2024-01-08", "users"] == 1
+    assert activity.loc["2024-01-05", "comments"] == 1
+
+
+def test_comments_before_first_session_are_dropped():
+    sessions = pd.bdate_range("2024-01-01", "2024-01-05")
+    df = _comments(
+        ["2015-06-01 12:00"] * 500 + ["2023-12-31 12:00", "2024-01-01 12:00"],
+        ["old"] * 500 + ["a", "b"],
+    )
+    bursts = CommentBursts(sessions)
+    bursts.add_comments(df)
+    bursts.extend_sessions(pd.DatetimeIndex(["2024-01-08"]))
+    activity = bursts.activity_frame("TEST")
+    assert activity["comments"].tolist() == [1, 0, 0, 0, 0, 0]
+    assert activity["users"].tolist() == [1, 0, 0, 0, 0, 0]
+    counts, _ = session_counts(df, sessions)
+    assert counts.tolist() == [[1, 0, 0, 0, 0]]
+
+
+def test_incremental_matches_full():
+    rng = np.random.default_rng(0)
+    sessions = pd.bdate_range("2024-01-01", periods=60)
+    times = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        np.sort(rng.uniform(0, 85, 2_000)), unit="D"
+    )
+    df = _comments(times, rng.integers(0, 50, len(times)).astype(str))
+
+    full = CommentBursts(sessions)
+    full.add_comments(df)
+
+    incremental = CommentBursts(sessions[:20])
+    for i, part in enumerate(np.array_split(np.arange(len(df)), 6)):
+        incremental.add_comments(df.iloc[part])
+        incremental.extend_sessions(sessions[: 20 + 8 * (i + 1)])
+    for m in CommentBursts.METRICS:
+        np.testing.assert_array_equal(incremental.counts[m], full.counts[m])
+        np.testing.assert_allclose(incremental.zscores[m], full.zscores[m])
@@ -0,0 +1,12 @@
+import pandas as pd
+
+from pnd_moex.general.comment_store import CommentStore
+
+
+def test_naive_bounds_are_moscow_time(comment_pages):
+    store = CommentStore.from_frame(pd.concat(comment_pages, ignore_index=True))
+    # Comments are at 12:00-12:02 Moscow time, 09:00-09:02 UTC
+    assert len(store.query("TEST", "2024-01-10 12:00", "2024-01-10 12:01")) == 4
+    assert len(store.query("TEST", "2024-01-10 09:00", "2024-01-10 10:00")) == 0
+    utc = pd.Timestamp("2024-01-10 09:00", tz="UTC")
+    assert len(store.query("TEST", utc, utc + pd.Timedelta(hours=1))) == 12
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from pnd_moex.general.event_study import event_positions
+
+
+def test_event_positions_drops_events_off_the_panel():
+    dates = pd.bdate_range("2019-01-01", "2019-05-24")
+    events = pd.DataFrame(
+        {
+            "token": ["TEST"] * 5,
+            "p_date": pd.to_datetime(
+                ["2018-12-01", "2019-03-02", "2019-05-25", "2019-05-27", "2030-01-01"]
+            ),
+        }
+    )
+    located = event_positions(events, dates, pd.Index(["TEST"]))
+    # Saturdays go to the Friday before, Monday after the last session is off the panel
+    assert located["session"].tolist() == [
+        pd.Timestamp("2019-03-01"),
+        pd.Timestamp("2019-05-24"),
+    ]
@@ -0,0 +1,16 @@
+import pandas as pd
+
+from pnd_moex.general.near_duplicates import NearDuplicateIndex
+
+
+def test_doc_ids_are_positions(comment_pages):
+    index = NearDuplicateIndex()
+    for page in comment_pages:
+        index.add(page, n_jobs=1)
+    comments = pd.concat(comment_pages, ignore_index=True)
+    clusters = index.clusters()
+    # Fillers repeat across pages and form clusters of their own
+    is_spam = comments["is_spam"].to_numpy()[clusters["doc_id"]]
+    for _, cluster in clusters.groupby("cluster"):
+        assert len(set(comments["comment_text"].iloc[cluster["doc_id"]])) == 1
+    assert sorted(clusters["doc_id"][is_spam]) == [0, 5, 10]
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pnd_moex.general import price_matrix
+from pnd_moex.general.price_matrix import PriceMatrix
+
+
+def _candles(dates: list, close: float) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "TRADEDATE": pd.to_datetime(dates).repeat(2),
+            "SECID": ["AAA", "BBB"] * len(dates),
+            "CLOSE": close,
+        }
+    )
+
+
+def test_append_after_interrupted_append(tmp_path):
+    matrix = PriceMatrix.build(
+        _candles(["2024-01-08", "2024-01-09"], 1.0), str(tmp_path), fields=("CLOSE",)
+    )
+    # An append that wrote its rows but died before replacing the header
+    with open(matrix._file("CLOSE"), mode="ab") as file:
+        np.full(3 * matrix.header["capacity"], 99.0, dtype=np.float32).tofile(file)
+
+    matrix = PriceMatrix.open(str(tmp_path))
+    assert matrix.append_sessions(_candles(["2024-01-10"], 2.0)) == 1
+    close = PriceMatrix.open(str(tmp_path)).field("CLOSE")
+    np.testing.assert_array_equal(close, [[1.0, 1.0], [1.0, 1.0], [2.0, 2.0]])
+
+
+def test_interrupted_grow_keeps_old_layout(tmp_path, monkeypatch):
+    df = pd.DataFrame(
+        {
+            "TRADEDATE": pd.to_datetime(["2024-01-08"] * 3 + ["2024-01-09"] * 3),
+            "SECID": ["AAA", "BBB", "CCC"] * 2,
+            "CLOSE": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        }
+    )
+    PriceMatrix.build(df, str(tmp_path), fields=("CLOSE",), spare_capacity=0.34)
+    expected = PriceMatrix.open(str(tmp_path)).field("CLOSE").copy()
+
+    def crash(path, header):
+        raise OSError("interrupted")
+
+    monkeypatch.setattr(price_matrix, "_write_header", crash)
+    new = pd.DataFrame(
+        {
+            "TRADEDATE": pd.to_datetime(["2024-01-10"] * 6),
+            "SECID": [f"N{i}" for i in range(6)],
+            "CLOSE": 7.0,
+        }
+    )
+    with pytest.raises(OSError):
+        PriceMatrix.open(str(tmp_path)).append_sessions(new)
+    np.testing.assert_array_equal(
+        PriceMatrix.open(str(tmp_path)).field("CLOSE"), expected
+    )
+
+    monkeypatch.undo()
+    matrix = PriceMatrix.open(str(tmp_path))
+    assert matrix.append_sessions(new) == 1
+    close = PriceMatrix.open(str(tmp_path)).field("CLOSE")
+    np.testing.assert_array_equal(close[:2, :3], expected[:, :3])
+    np.testing.assert_array_equal(close[2, 3:], 7.0)
+    assert sorted(os.listdir(tmp_path)) == ["CLOSE.1.f32", "header.json"]
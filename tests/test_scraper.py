@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from pnd_moex.general.scraper import (
+    MFD_DATETIME_FORMAT,
+    MOSCOW_TZ,
+    normalize_comment_datetimes,
+)
+
+
+def test_mfd_times_are_moscow_wall_time():
+    df = pd.DataFrame({"comment_datetime": ["10.01.2024 12:30"]})
+    result = normalize_comment_datetimes(
+        df, datetime_format=MFD_DATETIME_FORMAT, source_tz=MOSCOW_TZ
+    )
+    assert result["comment_datetime"][0] == pd.Timestamp("2024-01-10 09:30", tz="UTC")
+
+
+def test_malformed_times_are_reported():
+    df = pd.DataFrame(
+        {"comment_datetime": ["2024-01-10T12:30:00+03:00", "вчера в 12:30", None]}
+    )
+    with pytest.warns(UserWarning, match="1 of 3"):
+        result = normalize_comment_datetimes(df)
+    assert result["comment_datetime"].isna().tolist() == [False, True, True]
@@ -0,0 +1,13 @@
+import pandas as pd
+
+from pnd_moex.general.search_index import SearchIndex
+
+
+def test_comment_keys_are_positions(comment_pages):
+    index = SearchIndex()
+    for page in comment_pages:
+        index.add_comments(page, n_jobs=1)
+    comments = pd.concat(comment_pages, ignore_index=True)
+    found = index.search("покупайте акции")
+    assert len(found) == 3
+    assert comments["is_spam"].iloc[found["key"]].all()
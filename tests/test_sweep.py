@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pnd_moex.general.general import anomaly_detect
+from pnd_moex.general.sweep import flag_matrices, precompute_statistics
+
+
+def _close_series(n: int = 300, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.03, n))
+    # Pumps of three sessions over 20% each, one of them touching the end of the series
+    for start in (50, 120, n - 2):
+        close[start:] *= 1.3
+        close[start + 1 :] *= 1.3
+        close[start + 2 :] *= 1.3
+    return pd.Series(close, index=pd.bdate_range("2020-01-01", periods=n))
+
+
+@pytest.mark.parametrize("method, value", [("3over20", 0.2), ("80over3", 0.8)])
+def test_default_grid_point_matches_anomaly_detect(method, value):
+    ts = _close_series()
+    expected = anomaly_detect(ts, quantile=False)[method].to_numpy()
+    stats = precompute_statistics(ts.to_numpy()[:, None])
+    flags = flag_matrices(stats[method], method, [value])[0, :, 0]
+    np.testing.assert_array_equal(flags, expected)
+
+
+def test_3over20_needs_three_returns():
+    # Rows 0 and 5 lack one of the three returns and must not be flagged
+    close = np.array([100, 130, 170, 180, 190, 250], dtype=float)
+    stats = precompute_statistics(close[:, None])
+    flags = flag_matrices(stats["3over20"], "3over20", [0.2])[0, :, 0]
+    expected = anomaly_detect(pd.Series(close), quantile=False)["3over20"].to_numpy()
+    np.testing.assert_array_equal(flags, expected)
+    assert not flags.any()